@@ -17,6 +17,8 @@ import os
 BASE_DIR = Path(__file__).resolve().parent.parent
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Avatar previews a user may request per minute
+AVATAR_PREVIEW_RATE_LIMIT = int(os.environ.get('DJANGO_AVATAR_PREVIEW_RATE_LIMIT', '60'))
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -48,6 +50,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'WebProjecte.middleware.PrimaryPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -76,13 +79,107 @@ WSGI_APPLICATION = 'DjangoProjectWeb.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DJANGO_DB_ENGINE=postgresql selects PostgreSQL (needs psycopg, plus psycopg[pool] for
+# pooling); SQLite in WAL mode stays the default for development and small deployments.
+DB_ENGINE = os.environ.get('DJANGO_DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'cards'),
+            'USER': os.environ.get('POSTGRES_USER', 'cards'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    # Connections come from a per-process psycopg pool. Persistent connections
+    # (CONN_MAX_AGE > 0) are off either way: under ASGI every request runs in a
+    # new thread and would leave its own connection open. A size of 0 disables
+    # the pool and opens one connection per request.
+    POOL_MAX_SIZE = int(os.environ.get('DJANGO_DB_POOL_MAX_SIZE', '10'))
+    if POOL_MAX_SIZE:
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DJANGO_DB_POOL_MIN_SIZE', '2')),
+            'max_size': POOL_MAX_SIZE,
+            'timeout': 10,
+        }
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DJANGO_SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Writers take the lock when the transaction starts, so concurrent
+                # workers wait on busy_timeout instead of failing with "database is locked"
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+                # journal_mode=WAL (readers no longer block the writer) is persistent,
+                # migration 0015 sets it once instead of every connection rewriting the file
+                'init_command': (
+                    'PRAGMA synchronous=NORMAL;'  # Safe with WAL, fsync only at checkpoints
+                    'PRAGMA busy_timeout=20000;'
+                    'PRAGMA mmap_size=268435456;'
+                    'PRAGMA cache_size=-20000;'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
     }
-}
 
+# Optional read replica: DJANGO_SQLITE_REPLICA_PATH for a second SQLite file
+# (a copy of db.sqlite3 is enough to try it locally), POSTGRES_REPLICA_HOST for PostgreSQL
+REPLICA_SETTINGS = None
+if DB_ENGINE == 'postgresql' and os.environ.get('POSTGRES_REPLICA_HOST'):
+    REPLICA_SETTINGS = {'HOST': os.environ['POSTGRES_REPLICA_HOST']}
+elif DB_ENGINE != 'postgresql' and os.environ.get('DJANGO_SQLITE_REPLICA_PATH'):
+    REPLICA_SETTINGS = {'NAME': os.environ['DJANGO_SQLITE_REPLICA_PATH']}
+if REPLICA_SETTINGS:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        **REPLICA_SETTINGS,
+        # Tests read the primary's test database through this alias
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['WebProjecte.db_router.ReplicaRouter']
+# Seconds a client keeps reading from the primary after it wrote something
+REPLICA_PIN_SECONDS = int(os.environ.get('DJANGO_REPLICA_PIN_SECONDS', '5'))
+
+
+# Cache
+# DJANGO_CACHE_BACKEND: 'file' (default), 'redis' or 'locmem'.
+# Catalog versions, pack samplers, ownership bitmaps and the friend graph are
+# invalidated through this cache, so every process (server workers and
+# management commands alike) must share it. 'locmem' is per process and only
+# fits a single process that never runs the catalog commands beside it.
+CACHE_BACKEND = os.environ.get('DJANGO_CACHE_BACKEND', 'file')
+if CACHE_BACKEND == 'redis':
+    # Needs the redis package
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_URL', 'redis://localhost:6379/0'),
+    }}
+elif CACHE_BACKEND == 'file':
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_URL', os.path.join(BASE_DIR, 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }}
+else:
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }}
+# Tests swap in a private locmem cache so they never touch the shared one
+TEST_RUNNER = 'WebProjecte.test_runner.TestRunner'
+# In-process L1 in front of the cache above for catalog projections
+CATALOG_L1_MAX_ENTRIES = int(os.environ.get('DJANGO_CATALOG_L1_MAX_ENTRIES', '256'))
+CATALOG_L1_TTL = int(os.environ.get('DJANGO_CATALOG_L1_TTL', '300'))
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -122,6 +219,28 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / 'WebProjecte/static',
 ]
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+if not DEBUG:
+    # Hashed file names (safe to cache forever) plus .gz/.br copies, run collectstatic on deploy
+    STORAGES['staticfiles']['BACKEND'] = 'WebProjecte.storage.CompressedManifestStaticFilesStorage'
+
+# Serve collected static files from Django when no front server does it
+SERVE_STATIC = os.environ.get('DJANGO_SERVE_STATIC', str(not DEBUG)) == 'True'
+# Hand media transfers to the front server: 'X-Accel-Redirect' (nginx) or 'X-Sendfile' (Apache)
+MEDIA_SENDFILE_HEADER = os.environ.get('DJANGO_SENDFILE_HEADER', '')
+# nginx internal location aliased to MEDIA_ROOT, used with X-Accel-Redirect
+MEDIA_ACCEL_PREFIX = os.environ.get('DJANGO_ACCEL_PREFIX', '/protected-media/')
+# Profile images are replaced under the same name, so media is revalidated on every use
+MEDIA_MAX_AGE = 0
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.models import User
 
-from .models import Card, Rarity, CardSet, Profile, Collection, CollectionCard, UserCard
+from .models import Card, Rarity, CardSet, Profile, Collection, CollectionCard, UserCard, AvatarJob, PendingFileDeletion
 
 admin.site.register(Card)
 admin.site.register(Rarity)
@@ -9,4 +9,6 @@ admin.site.register(CardSet)
 admin.site.register(Profile)
 admin.site.register(Collection)
 admin.site.register(CollectionCard)
-admin.site.register(UserCard)
\ No newline at end of file
+admin.site.register(UserCard)
+admin.site.register(AvatarJob)
+admin.site.register(PendingFileDeletion)
\ No newline at end of file
@@ -6,3 +6,4 @@ class WebProjecteConfig(AppConfig):
 
     def ready(self):
         import WebProjecte.signals
+        import WebProjecte.checks
@@ -0,0 +1,64 @@
+from django.core.checks import Tags, Warning, register
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+
+from WebProjecte.models import AvatarJob, Card, CardSet, CollectionCard, FriendRequest, Profile, Rarity, UserCard
+
+# (model, leading fields) for every index a hot query path depends on
+REQUIRED_INDEXES = [
+    (CollectionCard, ('collection', 'card')),  # open_pack upsert, ownership bitmap
+    (Card, ('card_set', 'rarity', 'id')),  # per-set pack sampler
+    (Card, ('card_set', 'title')),  # import_catalog upsert
+    (CardSet, ('title',)),
+    (Rarity, ('title',)),
+    (UserCard, ('user',)),  # custom card upsert
+    (Profile, ('search_name',)),  # friend search
+    (FriendRequest, ('from_user', 'to_user')),
+    (AvatarJob, ('status', 'run_after')),  # job claiming
+]
+
+
+def _columns(model, fields):
+    return [model._meta.get_field(name).column for name in fields]
+
+
+def _has_pending_migrations(connection):
+    executor = MigrationExecutor(connection)
+    return bool(executor.migration_plan(executor.loader.graph.leaf_nodes()))
+
+
+@register(Tags.database)
+def check_required_indexes(app_configs, databases=None, **kwargs):
+    """Warn when an index the views rely on is missing from a database.
+
+    Runs with ``manage.py check --database default`` and before ``migrate``
+    applies anything, so databases with pending migrations are skipped:
+    those migrations are what adds the missing indexes.
+    """
+    warnings = []
+    for alias in databases or []:
+        connection = connections[alias]
+        if _has_pending_migrations(connection):
+            continue
+        with connection.cursor() as cursor:
+            tables = set(connection.introspection.table_names(cursor))
+            constraints = {}
+            for model, fields in REQUIRED_INDEXES:
+                table = model._meta.db_table
+                if table not in tables:
+                    # Not migrated yet, migrate reports that itself
+                    continue
+                if table not in constraints:
+                    constraints[table] = connection.introspection.get_constraints(cursor, table).values()
+                columns = _columns(model, fields)
+                if not any(
+                    (info['index'] or info['unique']) and info['columns'][:len(columns)] == columns
+                    for info in constraints[table]
+                ):
+                    warnings.append(Warning(
+                        f"Missing index on {table}({', '.join(columns)}) in database '{alias}'.",
+                        hint='Run manage.py migrate.',
+                        obj=model,
+                        id='WebProjecte.W001',
+                    ))
+    return warnings
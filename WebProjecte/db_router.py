@@ -0,0 +1,118 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DATABASE = 'replica'
+# Read-mostly models whose reads can tolerate replication lag
+CATALOG_MODELS = {'WebProjecte.Card', 'WebProjecte.CardSet', 'WebProjecte.Rarity'}
+# Session saves happen on every request and say nothing about what the user changed
+UNTRACKED_APPS = {'sessions'}
+
+_in_request = ContextVar('in_request', default=False)
+_pinned = ContextVar('pinned_to_primary', default=False)
+_replica_reads = ContextVar('replica_reads', default=False)
+_wrote = ContextVar('wrote_to_primary', default=False)
+
+
+def replica_configured():
+    return REPLICA_DATABASE in settings.DATABASES
+
+
+def wrote_to_primary():
+    return _wrote.get()
+
+
+def start_request(pinned):
+    """Reset the routing state for a new request. Returns tokens for ``end_request``."""
+    return _in_request.set(True), _pinned.set(pinned), _wrote.set(False)
+
+
+def end_request(tokens):
+    in_request_token, pinned_token, wrote_token = tokens
+    _in_request.reset(in_request_token)
+    _pinned.reset(pinned_token)
+    _wrote.reset(wrote_token)
+
+
+@contextmanager
+def on_primary():
+    """Read from the primary inside the block.
+
+    Used where query results are cached: a lagging replica would otherwise
+    refill a freshly invalidated cache with stale rows.
+    """
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def read_from_replica(view):
+    """Send every read of ``view`` to the replica, not only catalog reads.
+
+    For browse pages that only display data. Requests pinned to the primary
+    and reads after a write in the same request still go to the primary.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            # Context variables reach the threads the async ORM runs queries in
+            token = _replica_reads.set(True)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _replica_reads.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Routes reads to the ``replica`` alias when one is configured.
+
+    Only requests going through ``PrimaryPinMiddleware`` use the replica:
+    catalog models in every request, other models only inside views
+    decorated with ``read_from_replica``. Management commands, transactions
+    and everything after a write read from the primary, and all writes go
+    to ``default``. The middleware keeps a user who wrote on the primary for
+    ``REPLICA_PIN_SECONDS`` so they never read a replica that has not caught
+    up with them.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not replica_configured() or _pinned.get() or _wrote.get():
+            return None
+        if not (_in_request.get() or _replica_reads.get()):
+            return None
+        # Reads inside a transaction belong to a write flow and must see its rows
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        if model._meta.label in CATALOG_MODELS or _replica_reads.get():
+            return REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Also asked for write-intent reads (get_or_create, select_for_update):
+        # keep those off pages that only display data
+        if model._meta.app_label not in UNTRACKED_APPS:
+            _wrote.set(True)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        databases = {'default', REPLICA_DATABASE}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
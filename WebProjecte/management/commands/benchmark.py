@@ -0,0 +1,195 @@
+import json
+import random
+import statistics
+import time
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+
+from WebProjecte.models import Card, CardSet, Collection, PackStatus, Profile, Rarity
+from WebProjecte.services import card_sampler, catalog
+from WebProjecte.services.catalog import bump_catalog_version
+
+ENDPOINTS = ['open_pack', 'collection_view', 'api_cards', 'user_cards_api']
+
+# Private cache for the run: catalog projections, fragments, ownership and
+# friend entries of the synthetic data must never reach the shared cache
+BENCHMARK_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'benchmark',
+}}
+
+RARITIES = [
+    ("Common", 0.6),
+    ("Rare", 0.25),
+    ("Epic", 0.1),
+    ("Legendary", 0.05),
+]
+
+
+def clear_process_caches():
+    catalog._local.clear()
+    card_sampler._samplers.clear()
+
+
+def percentile(values, pct):
+    # Nearest-rank percentile over an already sorted list
+    index = max(0, int(round(pct / 100 * len(values))) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark pack opening and card endpoints on a throwaway database and print JSON results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Number of synthetic users')
+        parser.add_argument('--sets', type=int, default=2, help='Number of card sets')
+        parser.add_argument('--cards-per-rarity', type=int, default=10,
+                            help='Number of cards per rarity in every set')
+        parser.add_argument('--iterations', type=int, default=100, help='Measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per endpoint')
+        parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=ENDPOINTS)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for reproducible runs')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        for key in ('users', 'sets', 'cards_per_rarity', 'iterations'):
+            if options[key] < 1:
+                raise CommandError(f"--{key.replace('_', '-')} must be at least 1")
+
+        random.seed(options['seed'])
+        # Overriding CACHES closes and resets django.core.cache.caches on the
+        # way in and out; the in-process catalog and sampler caches are
+        # cleared by hand so neither side sees the other's entries
+        with override_settings(CACHES=BENCHMARK_CACHES):
+            clear_process_caches()
+            try:
+                report = self.run(options)
+            finally:
+                clear_process_caches()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f"📊 Benchmark report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def run(self, options):
+        setup_test_environment()
+        # Everything runs on a fresh test database, the real one is never touched
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            card_sets, users = self.seed(options)
+            return {
+                'config': {key: options[key] for key in
+                           ('users', 'sets', 'cards_per_rarity', 'iterations', 'warmup', 'seed')},
+                'environment': {
+                    'django': django.get_version(),
+                    'database': connection.vendor,
+                },
+                'results': {
+                    name: self.measure(name, card_sets, users, options)
+                    for name in options['endpoints']
+                },
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def seed(self, options):
+        rarities = Rarity.objects.bulk_create([
+            Rarity(title=title, description=title, probability=probability)
+            for title, probability in RARITIES
+        ])
+        card_sets = CardSet.objects.bulk_create([
+            CardSet(title=f"Bench Set {i}", description="Synthetic set", image='card_sets/bench.png')
+            for i in range(options['sets'])
+        ])
+        Card.objects.bulk_create([
+            Card(
+                title=f"{card_set.title} {rarity.title} {i}",
+                description="Synthetic card",
+                image='card_images/bench.png',
+                rarity=rarity,
+                card_set=card_set,
+            )
+            for card_set in card_sets
+            for rarity in rarities
+            for i in range(options['cards_per_rarity'])
+        ], batch_size=500)
+
+        # bulk_create skips signals, so related rows are created by hand
+        password = make_password(None)
+        users = User.objects.bulk_create([
+            User(username=f"bench_user_{i}", password=password)
+            for i in range(options['users'])
+        ], batch_size=500)
+        Profile.objects.bulk_create([Profile(user=user) for user in users], batch_size=500)
+        Collection.objects.bulk_create([Collection(user=user) for user in users], batch_size=500)
+        PackStatus.objects.bulk_create([
+            PackStatus(user=user, packs_available=10 ** 9) for user in users
+        ], batch_size=500)
+        bump_catalog_version()
+
+        clients = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+        return card_sets, clients
+
+    def request(self, name, client, card_sets):
+        if name == 'open_pack':
+            card_set = random.choice(card_sets)
+            return client.post(reverse('open_pack', args=[card_set.id]))
+        if name == 'collection_view':
+            return client.get(reverse('collection'))
+        if name == 'api_cards':
+            return client.get(reverse('api_cards'))
+        return client.get(reverse('user_cards_api'))
+
+    def measure(self, name, card_sets, clients, options):
+        for i in range(options['warmup']):
+            self.request(name, clients[i % len(clients)], card_sets)
+
+        latencies = []
+        queries = []
+        errors = 0
+        started = time.perf_counter()
+        for i in range(options['iterations']):
+            client = clients[i % len(clients)]
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                response = self.request(name, client, card_sets)
+                latencies.append(time.perf_counter() - t0)
+            queries.append(len(ctx.captured_queries))
+            if response.status_code >= 400:
+                errors += 1
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'iterations': options['iterations'],
+            'errors': errors,
+            'ops_per_sec': round(options['iterations'] / elapsed, 2) if elapsed else None,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50) * 1000, 3),
+                'p99': round(percentile(latencies, 99) * 1000, 3),
+                'mean': round(statistics.fmean(latencies) * 1000, 3),
+                'max': round(latencies[-1] * 1000, 3),
+            },
+            'queries_per_request': {
+                'mean': round(statistics.fmean(queries), 2),
+                'max': max(queries),
+            },
+        }
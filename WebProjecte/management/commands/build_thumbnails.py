@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from WebProjecte.models import Card, CardSet, UserCard, Profile
+from WebProjecte.services.catalog import bump_catalog_version
+from WebProjecte.services.thumbnails import generate_thumbnails
+
+# Model name -> (model, image field)
+SOURCES = {
+    'card': (Card, 'image'),
+    'cardset': (CardSet, 'image'),
+    'usercard': (UserCard, 'image'),
+    'profile': (Profile, 'profile_image'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive thumbnails for existing card, set and profile images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--models', nargs='+', choices=SOURCES, default=list(SOURCES),
+                            help='Only process these models')
+        parser.add_argument('--force', action='store_true', help='Rebuild thumbnails that already exist')
+
+    def handle(self, *args, **options):
+        for key in options['models']:
+            model, field_name = SOURCES[key]
+            storage = model._meta.get_field(field_name).storage
+            names = (
+                model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                .values_list(field_name, flat=True).distinct().iterator()
+            )
+            images = written = 0
+            for name in names:
+                images += 1
+                if generate_thumbnails(name, storage, force=options['force']):
+                    written += 1
+            self.stdout.write(self.style.SUCCESS(
+                f"🖼️ {model.__name__}: thumbnails built for {written} of {images} images"
+            ))
+            if written and model in (Card, CardSet):
+                # Cached card fragments and set lists embed srcset
+                bump_catalog_version(model.__name__)
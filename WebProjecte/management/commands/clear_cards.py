@@ -1,12 +1,35 @@
-from django.core.management.base import BaseCommand
-from WebProjecte.models import Card, Rarity, CardSet, CollectionCard
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from WebProjecte.models import CardSet
+from WebProjecte.services.bulk_delete import DELETE_BATCH_SIZE
+from WebProjecte.services.catalog_reset import reset_catalog
 
 class Command(BaseCommand):
-    help = 'Delete all cards, rarities, collections...'
-
-    def handle(self, *args, **kwargs):
-        CollectionCard.objects.all().delete()
-        Card.objects.all().delete()
-        CardSet.objects.all().delete()
-        Rarity.objects.all().delete()
-        self.stdout.write(self.style.SUCCESS("🧹 Data reset."))
+    help = 'Delete all cards, rarities, collections... or only some card sets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--set', nargs='+', dest='sets', metavar='SET',
+                            help='Only delete these card sets (ids or titles) and their cards')
+        parser.add_argument('--keep-collections', action='store_true',
+                            help='Keep cards that are in a user collection')
+        parser.add_argument('--keep-user-cards', action='store_true',
+                            help='Keep rarities used by custom user cards')
+        parser.add_argument('--batch-size', type=int, default=DELETE_BATCH_SIZE,
+                            help='Rows deleted per transaction')
+
+    def handle(self, *args, **options):
+        set_ids = None
+        if options['sets']:
+            ids = [int(value) for value in options['sets'] if value.isdigit()]
+            set_ids = list(CardSet.objects.filter(Q(id__in=ids) | Q(title__in=options['sets']))
+                           .values_list('id', flat=True))
+            if not set_ids:
+                raise CommandError('No card set matches ' + ', '.join(options['sets']))
+
+        def progress(model, deleted):
+            self.stdout.write(f"   {model}: {deleted} deleted")
+
+        deleted = reset_catalog(set_ids, options['keep_collections'], options['keep_user_cards'],
+                                options['batch_size'], progress)
+        summary = ', '.join(f"{count} {model}" for model, count in deleted.items())
+        self.stdout.write(self.style.SUCCESS(f"🧹 Data reset ({summary})."))
@@ -1,9 +1,20 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 
+from WebProjecte.services.account_deletion import DELETE_BATCH_SIZE, delete_users
+
 class Command(BaseCommand):
-    help = 'Deletes all users except superusers'
+    help = 'Deletes all users except superusers, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DELETE_BATCH_SIZE,
+                            help='Users deleted per transaction')
+
+    def handle(self, *args, **options):
+        def progress(deleted, total):
+            self.stdout.write(f"   {deleted}/{total} users deleted")
 
-    def handle(self, *args, **kwargs):
-        users_deleted = User.objects.exclude(is_superuser=True).delete()
-        self.stdout.write(self.style.SUCCESS(f"🧹 Deleted {users_deleted[0]} users (excluding superusers)."))
+        users_deleted = delete_users(User.objects.exclude(is_superuser=True), options['batch_size'], progress)
+        self.stdout.write(self.style.SUCCESS(f"🧹 Deleted {users_deleted} users (excluding superusers)."))
+        if users_deleted:
+            self.stdout.write("   Run sweep_files to remove their images.")
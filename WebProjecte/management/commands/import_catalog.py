@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from WebProjecte.services.catalog_import import IMPORT_BATCH_SIZE, CatalogImportError, import_catalog
+
+
+class Command(BaseCommand):
+    help = 'Import rarities, card sets and cards from CSV, JSON or JSONL files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rarities', help='File with title, description, probability')
+        parser.add_argument('--sets', help='File with title, description, image')
+        parser.add_argument('--cards', help='File with title, description, image, set and rarity titles')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Rows per upsert')
+        parser.add_argument('--dry-run', action='store_true', help='Print the diff without writing anything')
+
+    def handle(self, *args, **options):
+        if not any(options[kind] for kind in ('rarities', 'sets', 'cards')):
+            raise CommandError('Give at least one of --rarities, --sets or --cards')
+
+        # The diff is the point of a dry run; a real import only lists it with -v 2
+        show_diff = options['dry_run'] or options['verbosity'] > 1
+        try:
+            stats = import_catalog(
+                rarities=options['rarities'], sets=options['sets'], cards=options['cards'],
+                dry_run=options['dry_run'], batch_size=options['batch_size'],
+                report=self.stdout.write if show_diff else None,
+            )
+        except (CatalogImportError, OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        prefix = '🔍 Dry run: would import' if options['dry_run'] else '📦 Imported'
+        for kind, counts in stats.items():
+            if counts:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{prefix} {kind}s: {counts['created']} created, {counts['updated']} updated, "
+                    f"{counts['unchanged']} unchanged"
+                ))
+        if not options['dry_run'] and stats['card']['created'] + stats['card']['updated']:
+            self.stdout.write("   Run build_thumbnails to prepare the new card images.")
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from WebProjecte.services.avatar_jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Process queued avatar generation jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process due jobs once and exit')
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs claimed per poll')
+        parser.add_argument('--sleep', type=float, default=5, help='Seconds to wait when the queue is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = run_pending(options['batch_size'])
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f"🖼️ Processed {processed} avatar jobs"))
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['sleep'])
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from WebProjecte.services.file_cleanup import sweep
+
+
+class Command(BaseCommand):
+    help = 'Delete files queued for removal (replaced card images, deleted accounts...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Files deleted per batch')
+
+    def handle(self, *args, **options):
+        total = 0
+        while batch := sweep(options['batch_size']):
+            total += batch
+        self.stdout.write(self.style.SUCCESS(f"🧹 Swept {total} queued files."))
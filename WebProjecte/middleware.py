@@ -0,0 +1,51 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from WebProjecte.db_router import end_request, replica_configured, start_request, wrote_to_primary
+
+PIN_COOKIE = 'primary_pin'
+
+
+class PrimaryPinMiddleware:
+    """Keeps a client on the primary database for a while after it writes.
+
+    Sync and async capable, so async views stay on the event loop under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replica_configured():
+            return self.get_response(request)
+
+        tokens = start_request(pinned=PIN_COOKIE in request.COOKIES)
+        try:
+            return self.pin(self.get_response(request))
+        finally:
+            end_request(tokens)
+
+    async def __acall__(self, request):
+        if not replica_configured():
+            return await self.get_response(request)
+
+        tokens = start_request(pinned=PIN_COOKIE in request.COOKIES)
+        try:
+            return self.pin(await self.get_response(request))
+        finally:
+            end_request(tokens)
+
+    @staticmethod
+    def pin(response):
+        if wrote_to_primary():
+            # Expires on its own once the replica has had time to catch up
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WebProjecte', '0008_packstatus'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='collectioncard',
+            index=models.Index(fields=['collection', 'card'], name='collectioncard_coll_card_idx'),
+        ),
+    ]
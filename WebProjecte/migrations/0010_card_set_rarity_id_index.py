@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WebProjecte', '0009_collectioncard_collection_card_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['card_set', 'rarity', 'id'], name='card_set_rarity_id_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:53
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def keep_latest_user_card(apps, schema_editor):
+    # Older duplicates are dropped before the constraint; their files are queued for the sweeper
+    UserCard = apps.get_model('WebProjecte', 'UserCard')
+    PendingFileDeletion = apps.get_model('WebProjecte', 'PendingFileDeletion')
+    latest_ids = UserCard.objects.values('user').annotate(latest=Max('id')).values('latest')
+    stale = UserCard.objects.exclude(id__in=latest_ids)
+    PendingFileDeletion.objects.bulk_create([
+        PendingFileDeletion(name=name) for name in stale.values_list('image', flat=True) if name
+    ])
+    stale.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WebProjecte', '0011_avatarjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingFileDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(keep_latest_user_card, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='usercard',
+            constraint=models.UniqueConstraint(fields=('user',), name='unique_user_card'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:56
+
+import unicodedata
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def fill_search_name(apps, schema_editor):
+    Profile = apps.get_model('WebProjecte', 'Profile')
+    batch = []
+    for profile in Profile.objects.select_related('user').only('id', 'user__username').iterator(chunk_size=BATCH_SIZE):
+        profile.search_name = unicodedata.normalize('NFKC', profile.user.username).casefold()
+        batch.append(profile)
+        if len(batch) >= BATCH_SIZE:
+            Profile.objects.bulk_update(batch, ['search_name'])
+            batch = []
+    Profile.objects.bulk_update(batch, ['search_name'])
+
+
+def create_trigram_index(apps, schema_editor):
+    # Substring search only runs on PostgreSQL, other backends keep the prefix index
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS profile_search_name_trgm '
+        'ON "WebProjecte_profile" USING gin (search_name gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS profile_search_name_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WebProjecte', '0012_usercard_unique_user_pendingfiledeletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=150),
+        ),
+        migrations.RunPython(fill_search_name, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
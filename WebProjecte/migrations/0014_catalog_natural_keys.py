@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:01
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    # Rows sharing a natural key are merged into the oldest one before the constraints
+    Rarity = apps.get_model('WebProjecte', 'Rarity')
+    CardSet = apps.get_model('WebProjecte', 'CardSet')
+    Card = apps.get_model('WebProjecte', 'Card')
+    UserCard = apps.get_model('WebProjecte', 'UserCard')
+    CollectionCard = apps.get_model('WebProjecte', 'CollectionCard')
+
+    def duplicates(model, *fields):
+        groups = model.objects.values(*fields).annotate(keep=Min('id'), rows=Count('id')).filter(rows__gt=1)
+        for group in groups:
+            keep = group.pop('keep')
+            group.pop('rows')
+            yield keep, list(model.objects.filter(**group).exclude(id=keep).values_list('id', flat=True))
+
+    for keep, others in duplicates(Rarity, 'title'):
+        Card.objects.filter(rarity_id__in=others).update(rarity_id=keep)
+        UserCard.objects.filter(rarity_id__in=others).update(rarity_id=keep)
+        Rarity.objects.filter(id__in=others).delete()
+    for keep, others in duplicates(CardSet, 'title'):
+        Card.objects.filter(card_set_id__in=others).update(card_set_id=keep)
+        CardSet.objects.filter(id__in=others).delete()
+    for keep, others in duplicates(Card, 'card_set', 'title'):
+        for entry in CollectionCard.objects.filter(card_id__in=others):
+            kept = CollectionCard.objects.filter(collection_id=entry.collection_id, card_id=keep).first()
+            if kept:
+                kept.quantity += entry.quantity
+                kept.save(update_fields=['quantity'])
+                entry.delete()
+            else:
+                entry.card_id = keep
+                entry.save(update_fields=['card'])
+        Card.objects.filter(id__in=others).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('WebProjecte', '0013_profile_search_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='card',
+            constraint=models.UniqueConstraint(fields=('card_set', 'title'), name='unique_card_set_card_title'),
+        ),
+        migrations.AddConstraint(
+            model_name='cardset',
+            constraint=models.UniqueConstraint(fields=('title',), name='unique_card_set_title'),
+        ),
+        migrations.AddConstraint(
+            model_name='rarity',
+            constraint=models.UniqueConstraint(fields=('title',), name='unique_rarity_title'),
+        ),
+    ]
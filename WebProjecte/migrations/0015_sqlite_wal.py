@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:05
+
+from django.db import migrations
+
+
+def set_journal_mode(mode):
+    def run(apps, schema_editor):
+        # The journal mode is stored in the database file, so it is set once here
+        if schema_editor.connection.vendor == 'sqlite':
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA journal_mode={mode}')
+    return run
+
+
+class Migration(migrations.Migration):
+    # SQLite cannot change the journal mode inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('WebProjecte', '0014_catalog_natural_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_journal_mode('WAL'), set_journal_mode('DELETE')),
+    ]
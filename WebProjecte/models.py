@@ -2,7 +2,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from WebProjecte.services.profile_image import generate_avatar
+from WebProjecte.services.thumbnails import field_srcset
 from django.utils import timezone
 from datetime import timedelta
 
@@ -18,6 +18,12 @@ class Rarity(models.Model):
     description = models.TextField()
     probability = models.FloatField()
 
+    class Meta:
+        constraints = [
+            # Natural key used by import_catalog
+            models.UniqueConstraint(fields=['title'], name='unique_rarity_title'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -27,9 +33,18 @@ class CardSet(models.Model):
     description = models.TextField()
     image = models.ImageField(upload_to='card_sets', blank=True, null=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['title'], name='unique_card_set_title'),
+        ]
+
     def __str__(self):
         return self.title
 
+    @property
+    def image_srcset(self):
+        return field_srcset(self.image)
+
 
 class Card(models.Model):
     title = models.CharField(max_length=100)
@@ -38,9 +53,22 @@ class Card(models.Model):
     rarity = models.ForeignKey(Rarity, on_delete=models.CASCADE)
     card_set = models.ForeignKey(CardSet, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # The per-set pack sampler filters by set and reads in id order
+            models.Index(fields=['card_set', 'rarity', 'id'], name='card_set_rarity_id_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['card_set', 'title'], name='unique_card_set_card_title'),
+        ]
+
     def __str__(self):
         return self.title
 
+    @property
+    def image_srcset(self):
+        return field_srcset(self.image)
+
 
 class UserCard(models.Model):
     title = models.CharField(max_length=100)
@@ -50,6 +78,12 @@ class UserCard(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cards')
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        constraints = [
+            # Each user has a single custom card, replaced by upsert in add_card
+            models.UniqueConstraint(fields=['user'], name='unique_user_card'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -59,9 +93,9 @@ class UserCard(models.Model):
             return self.image.url
         return None
 
-    def save(self, *args, **kwargs):
-        UserCard.objects.filter(user=self.user).exclude(pk=self.pk).delete()
-        super().save(*args, **kwargs)
+    @property
+    def image_srcset(self):
+        return field_srcset(self.image)
 
 
 class CollectionCard(models.Model):
@@ -71,6 +105,10 @@ class CollectionCard(models.Model):
 
     class Meta:
         unique_together = ('card', 'collection')
+        indexes = [
+            # Per-user listings walk a collection in card id order
+            models.Index(fields=['collection', 'card'], name='collectioncard_coll_card_idx'),
+        ]
 
     def __str__(self):
         return f"{self.quantity} x {self.card.title} in {self.collection}"
@@ -80,10 +118,35 @@ class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     profile_image = models.ImageField(upload_to='profile_pics', blank=True, null=True)
     friends = models.ManyToManyField("self", symmetrical=True, blank=True)
+    # Normalized username, kept in sync by signals for indexed user search
+    search_name = models.CharField(max_length=150, db_index=True, editable=False, default='')
 
     def __str__(self):
         return f'{self.user.username} Profile'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Stored image name as loaded, so saves can tell what changed without a query
+        instance._loaded_profile_image = instance.__dict__.get('profile_image', models.DEFERRED)
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_profile_image = self.profile_image.name
+
+    @property
+    def loaded_profile_image(self):
+        """Image name currently stored in the database, or ``DEFERRED`` if unknown."""
+        return getattr(self, '_loaded_profile_image', models.DEFERRED if self.pk else None)
+
+    def profile_image_changed(self):
+        return (self.loaded_profile_image or None) != (self.profile_image.name or None)
+
+    @property
+    def profile_image_srcset(self):
+        return field_srcset(self.profile_image)
+
 
 class FriendRequest(models.Model):
     from_user = models.ForeignKey(User, related_name='sent_requests', on_delete=models.CASCADE)
@@ -100,23 +163,104 @@ def create_user_profile_and_collection(sender, instance, created, **kwargs):
         Profile.objects.create(user=instance)
         Collection.objects.create(user=instance)
         PackStatus.objects.create(user=instance)
-        generate_avatar(instance)  # Avatar generation via API
+        AvatarJob.objects.create(user=instance)  # Avatar generated by the run_avatar_jobs worker
 
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+def save_user_profile(sender, instance, created, **kwargs):
+    # Only a profile already loaded on this user can hold unsaved changes;
+    # plain user saves such as the last_login update on login skip it
+    if created or not User.profile.is_cached(instance):
+        return
+    profile = instance.profile
+    if profile.profile_image_changed():
+        profile.save()
+
+MAX_PACKS = 2
+PACK_REGEN_INTERVAL = timedelta(hours=4)
+
 
 class PackStatus(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     last_opened = models.DateTimeField(default=timezone.now)
     packs_available = models.IntegerField(default=2)
 
-    def update_packs(self):
-        now = timezone.now()
-        elapsed = now - self.last_opened
-        new_packs = int(elapsed.total_seconds() // (4 * 3600))  # cada 4 horas
+    def regenerated(self, now=None):
+        """Return ``(packs_available, last_opened)`` as of ``now`` without saving.
+
+        One pack is regenerated every ``PACK_REGEN_INTERVAL``, up to ``MAX_PACKS``.
+        """
+        now = now or timezone.now()
+        new_packs = int((now - self.last_opened) // PACK_REGEN_INTERVAL)
         if new_packs > 0:
-            self.packs_available = min(2, self.packs_available + new_packs)
-            self.last_opened += timedelta(hours=4 * new_packs)
-            self.save()
+            return (min(MAX_PACKS, self.packs_available + new_packs),
+                    self.last_opened + PACK_REGEN_INTERVAL * new_packs)
+        return self.packs_available, self.last_opened
+
+    @property
+    def current_packs(self):
+        return self.regenerated()[0]
+
+    def consume_pack(self, attempts=5):
+        """Atomically take one pack, applying pending regeneration first.
+
+        The row is only written by a compare-and-swap UPDATE that matches the
+        values read, so two concurrent requests can never spend the same pack.
+        Returns the remaining balance, or ``None`` if no pack was available.
+        """
+        for _ in range(attempts):
+            now = timezone.now()
+            packs, _ = self.regenerated(now)
+            if packs <= 0:
+                return None
+
+            updated = PackStatus.objects.filter(
+                pk=self.pk,
+                packs_available=self.packs_available,
+                last_opened=self.last_opened,
+            ).update(packs_available=packs - 1, last_opened=now)
+            if updated:
+                self.packs_available, self.last_opened = packs - 1, now
+                return self.packs_available
+
+            # Someone else changed the row in between, retry on fresh values
+            self.refresh_from_db(fields=['packs_available', 'last_opened'])
+        return None
+
+
+class AvatarJob(models.Model):
+    """Pending avatar generation, processed by the ``run_avatar_jobs`` command."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='avatar_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='avatarjob_status_run_idx'),
+        ]
+
+    def __str__(self):
+        return f"Avatar job for {self.user.username} ({self.status})"
+
+
+class PendingFileDeletion(models.Model):
+    """Storage file no longer referenced, removed later by ``sweep_files``."""
+    name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
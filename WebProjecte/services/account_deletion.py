@@ -0,0 +1,84 @@
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+
+from WebProjecte.models import (
+    AvatarJob, Collection, CollectionCard, FriendRequest, PackStatus, Profile, UserCard,
+)
+from WebProjecte.services.bulk_delete import DELETE_BATCH_SIZE, raw_delete
+from WebProjecte.services.file_cleanup import queue_file_deletion
+from WebProjecte.services.friend_graph import Friendship, invalidate_friends
+from WebProjecte.services.ownership import invalidate_ownership
+
+
+def _dependent_querysets(user_ids):
+    """Every row referencing the users, children before parents."""
+    querysets = [
+        CollectionCard.objects.filter(collection__user_id__in=user_ids),
+        Collection.objects.filter(user_id__in=user_ids),
+        Friendship.objects.filter(Q(from_profile__user_id__in=user_ids) | Q(to_profile__user_id__in=user_ids)),
+        Profile.objects.filter(user_id__in=user_ids),
+        FriendRequest.objects.filter(Q(from_user_id__in=user_ids) | Q(to_user_id__in=user_ids)),
+        UserCard.objects.filter(user_id__in=user_ids),
+        PackStatus.objects.filter(user_id__in=user_ids),
+        AvatarJob.objects.filter(user_id__in=user_ids),
+        User.groups.through.objects.filter(user_id__in=user_ids),
+        User.user_permissions.through.objects.filter(user_id__in=user_ids),
+    ]
+    if apps.is_installed('django.contrib.admin'):
+        LogEntry = apps.get_model('admin', 'LogEntry')
+        querysets.append(LogEntry.objects.filter(user_id__in=user_ids))
+    return querysets
+
+
+def delete_user_batch(user_ids):
+    """Delete the given users and everything that references them in one transaction.
+
+    Image files are queued for the ``sweep_files`` command instead of being
+    removed here, and the friend and ownership caches of everyone affected
+    are invalidated once the transaction commits.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    with transaction.atomic():
+        files = list(Profile.objects.filter(user_id__in=user_ids).values_list('profile_image', flat=True))
+        files += UserCard.objects.filter(user_id__in=user_ids).values_list('image', flat=True)
+        queue_file_deletion(files)
+        friend_ids = set(
+            Friendship.objects.filter(from_profile__user_id__in=user_ids).values_list('to_profile__user_id', flat=True)
+        )
+
+        for queryset in _dependent_querysets(user_ids):
+            raw_delete(queryset)
+        deleted = raw_delete(User.objects.filter(pk__in=user_ids))
+
+        def invalidate():
+            invalidate_friends(*user_ids, *friend_ids)
+            for user_id in user_ids:
+                invalidate_ownership(user_id)
+
+        invalidate()
+        transaction.on_commit(invalidate)
+    return deleted
+
+
+def delete_users(queryset, batch_size=DELETE_BATCH_SIZE, progress=None):
+    """Delete the users in ``queryset`` in batches of ``batch_size``.
+
+    Each batch is its own short transaction, so the database is never locked
+    for the whole run and memory stays bounded by the batch. ``progress`` is
+    called with ``(deleted, total)`` after every batch. Returns the number of
+    users deleted.
+    """
+    total = queryset.count()
+    deleted = 0
+    while True:
+        user_ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not user_ids:
+            break
+        deleted += delete_user_batch(user_ids)
+        if progress:
+            progress(deleted, total)
+    return deleted
@@ -0,0 +1,80 @@
+import logging
+from datetime import timedelta
+
+from django.utils import timezone
+
+from WebProjecte.models import AvatarJob
+from WebProjecte.services.avatar_renderer import render_avatar
+from WebProjecte.services.profile_image import fetch_avatar, save_avatar
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+# Retry delays grow as RETRY_BACKOFF * 2 ** (attempts - 1)
+RETRY_BACKOFF = timedelta(seconds=30)
+# A running job whose worker died is picked up again after this long
+JOB_LEASE = timedelta(minutes=5)
+
+
+def claim_jobs(batch_size=10):
+    """Claim up to ``batch_size`` due jobs for this worker.
+
+    A job is claimed by a conditional UPDATE on its current status and
+    ``run_after``, so several workers can poll the same table safely.
+    """
+    now = timezone.now()
+    due = (
+        AvatarJob.objects
+        .filter(status__in=[AvatarJob.PENDING, AvatarJob.RUNNING], run_after__lte=now)
+        .order_by('run_after')
+        .values_list('pk', 'status', 'run_after')[:batch_size]
+    )
+    claimed = []
+    for pk, status, run_after in due:
+        updated = AvatarJob.objects.filter(pk=pk, status=status, run_after=run_after).update(
+            status=AvatarJob.RUNNING, run_after=now + JOB_LEASE,
+        )
+        if updated:
+            claimed.append(pk)
+    return list(AvatarJob.objects.filter(pk__in=claimed).select_related('user', 'user__profile'))
+
+
+def run_job(job):
+    """Generate the avatar for one claimed job. Returns the job's new status."""
+    job.attempts += 1
+    try:
+        # Never overwrite an image the user picked while the job was queued
+        if not job.user.profile.profile_image:
+            save_avatar(job.user, fetch_avatar())
+    except Exception as e:
+        # Any error is recorded, a job left RUNNING would be reclaimed forever
+        logger.exception("Avatar job %s failed on attempt %s", job.pk, job.attempts)
+        job.last_error = str(e) or type(e).__name__
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = AvatarJob.FAILED
+            save_fallback_avatar(job)
+        else:
+            job.status = AvatarJob.PENDING
+            job.run_after = timezone.now() + RETRY_BACKOFF * 2 ** (job.attempts - 1)
+    else:
+        job.status = AvatarJob.DONE
+        job.last_error = ''
+    job.save(update_fields=['status', 'attempts', 'run_after', 'last_error'])
+    return job.status
+
+
+def save_fallback_avatar(job):
+    # Seeded by the username, so the fallback is the same image on every run
+    try:
+        if not job.user.profile.profile_image:
+            save_avatar(job.user, render_avatar(job.user.username))
+    except Exception:
+        logger.exception("Fallback avatar for job %s failed", job.pk)
+
+
+def run_pending(batch_size=10):
+    """Process one batch of due jobs. Returns the number of jobs processed."""
+    jobs = claim_jobs(batch_size)
+    for job in jobs:
+        run_job(job)
+    return len(jobs)
@@ -0,0 +1,89 @@
+import colorsys
+import hashlib
+from functools import lru_cache
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+AVATAR_STYLES = ('identicon', 'robot')
+AVATAR_SIZE = 256
+BACKGROUND = (0xb6, 0xe3, 0xf4)
+# Recent renders kept per process, a few KB each
+AVATAR_MEMORY_CACHE_SIZE = 256
+
+
+def _palette(digest):
+    # Hue from the hash, fixed saturation and value keep every avatar readable
+    hue = int.from_bytes(digest[:2], 'big') / 0xFFFF
+    main = colorsys.hsv_to_rgb(hue, 0.65, 0.85)
+    dark = colorsys.hsv_to_rgb(hue, 0.75, 0.45)
+    return tuple(round(c * 255) for c in main), tuple(round(c * 255) for c in dark)
+
+
+def _draw_identicon(draw, digest, size):
+    color, _ = _palette(digest)
+    cells = 5
+    margin = size // 10
+    cell = (size - 2 * margin) // cells
+    bits = int.from_bytes(digest[2:6], 'big')
+    # Only the left three columns are random, the right two mirror them
+    for row in range(cells):
+        for col in range(3):
+            if bits & (1 << (row * 3 + col)):
+                for x in {col, cells - 1 - col}:
+                    left, top = margin + x * cell, margin + row * cell
+                    draw.rectangle([left, top, left + cell - 1, top + cell - 1], fill=color)
+
+
+def _draw_robot(draw, digest, size):
+    color, dark = _palette(digest)
+    unit = size // 16
+    # Antenna
+    draw.line([8 * unit, 2 * unit, 8 * unit, 4 * unit], fill=dark, width=max(1, unit // 2))
+    draw.ellipse([7 * unit, unit, 9 * unit, 3 * unit], fill=color)
+    # Head, with a rounder or squarer shape depending on the seed
+    radius = unit * (1 + digest[2] % 3)
+    draw.rounded_rectangle([3 * unit, 4 * unit, 13 * unit, 13 * unit], radius=radius, fill=color)
+    # Ears
+    draw.rectangle([2 * unit, 7 * unit, 3 * unit, 10 * unit], fill=dark)
+    draw.rectangle([13 * unit, 7 * unit, 14 * unit, 10 * unit], fill=dark)
+    # Eyes: round or square
+    eye = digest[3] % 2
+    for left in (5 * unit, 9 * unit):
+        box = [left, 6 * unit, left + 2 * unit, 8 * unit]
+        (draw.ellipse if eye else draw.rectangle)(box, fill='white')
+        draw.rectangle([left + unit // 2, 6 * unit + unit // 2, left + unit + unit // 2, 7 * unit + unit // 2],
+                       fill=dark)
+    # Mouth: solid bar or teeth
+    if digest[4] % 2:
+        draw.rectangle([5 * unit, 10 * unit, 11 * unit, 11 * unit], fill=dark)
+    else:
+        for i in range(4):
+            draw.rectangle([(5 + i * 1.5) * unit, 10 * unit, (6 + i * 1.5) * unit, 11 * unit], fill=dark)
+
+
+def render_avatar(seed, style='robot', size=AVATAR_SIZE):
+    """Render the avatar for ``seed`` as PNG bytes. Same input, same image."""
+    if style not in AVATAR_STYLES:
+        raise ValueError(f"Unknown avatar style: {style}")
+    digest = hashlib.sha256(f'{style}:{seed}'.encode()).digest()
+    image = Image.new('RGB', (size, size), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    if style == 'identicon':
+        _draw_identicon(draw, digest, size)
+    else:
+        _draw_robot(draw, digest, size)
+
+    buffer = BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=AVATAR_MEMORY_CACHE_SIZE)
+def avatar_png(seed, style='robot', size=AVATAR_SIZE):
+    """PNG bytes for ``seed``, rendered in memory.
+
+    A bounded per-process LRU serves repeated previews. Nothing is written
+    to disk here: only avatars saved on a profile are stored, as its image.
+    """
+    return render_avatar(seed, style, size)
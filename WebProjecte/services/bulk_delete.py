@@ -0,0 +1,32 @@
+from django.db import transaction
+
+DELETE_BATCH_SIZE = 500
+
+
+def raw_delete(queryset):
+    """One ``DELETE ... WHERE`` for ``queryset``, with no collector, cascades or signals.
+
+    Callers delete the dependent rows themselves, children first.
+    """
+    return queryset._raw_delete(queryset.db)
+
+
+def delete_in_batches(queryset, batch_size=DELETE_BATCH_SIZE, before_batch=None, progress=None):
+    """Delete ``queryset`` ``batch_size`` primary keys at a time, one transaction per batch.
+
+    ``before_batch(pks)`` runs inside each batch's transaction to remove the
+    rows that reference those keys. ``progress(deleted)`` is called after
+    each batch. Returns the number of rows deleted.
+    """
+    model = queryset.model
+    deleted = 0
+    while True:
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        with transaction.atomic():
+            if before_batch:
+                before_batch(pks)
+            deleted += raw_delete(model.objects.filter(pk__in=pks))
+        if progress:
+            progress(deleted)
@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from WebProjecte.models import Card
+from WebProjecte.services.catalog import CATALOG_CACHE_TIMEOUT, get_model_versions, image_url
+from WebProjecte.services.catalog_cache import get_cards
+from WebProjecte.services.thumbnails import srcset
+
+COLLECTION_CARD = 'fragments/collection_card.html'
+COLLECTION_CARD_HIDDEN = 'fragments/collection_card_hidden.html'
+PACK_CARD = 'fragments/pack_card.html'
+
+
+def fragment_key(template_name, card_id, version):
+    return f'fragment:{template_name}:{card_id}:{version}'
+
+
+def card_context(card):
+    storage = Card._meta.get_field('image').storage
+    return {**card, 'image_url': image_url(card['image']), 'srcset': srcset(card['image'], storage)}
+
+
+def card_fragments(card_ids, template_name, cards=None):
+    """``{card id: html}`` of ``template_name`` rendered for each card.
+
+    Fragments are cached per card and keyed by the Card version, so one
+    ``get_many`` serves a whole page and only cards never rendered since the
+    last catalog change go through the template engine. Anything that
+    depends on the viewer (owned, new) stays out of the fragment and is
+    applied around it. Ids missing from the catalog are skipped; pass
+    ``cards`` to render from the same ``get_cards()`` snapshot as the caller.
+    """
+    if not card_ids:
+        return {}
+    version = get_model_versions(['Card'])[0]
+    keys = {fragment_key(template_name, card_id, version): card_id for card_id in card_ids}
+    fragments = {keys[key]: mark_safe(html) for key, html in cache.get_many(keys).items()}
+
+    missing = [card_id for card_id in card_ids if card_id not in fragments]
+    if missing:
+        template = get_template(template_name)
+        cards = get_cards() if cards is None else cards
+        rendered = {}
+        for card_id in missing:
+            card = cards.get(card_id)
+            if card is None:
+                continue
+            html = template.render({'card': card_context(card)})
+            rendered[fragment_key(template_name, card_id, version)] = str(html)
+            fragments[card_id] = mark_safe(html)
+        cache.set_many(rendered, CATALOG_CACHE_TIMEOUT)
+    return fragments
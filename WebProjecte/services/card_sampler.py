@@ -0,0 +1,65 @@
+import random
+import threading
+from bisect import bisect_right
+from itertools import accumulate
+
+from WebProjecte.db_router import on_primary
+from WebProjecte.models import Card
+from WebProjecte.services.catalog import get_catalog_version
+
+# Samplers are built lazily per card set and kept in process memory along
+# with the catalog version they were built from. The key ``None`` holds the
+# sampler over the whole catalog.
+_samplers = {}
+_lock = threading.Lock()
+
+
+class CardSampler:
+    """Weighted card picker over a fixed card pool.
+
+    Each card weighs its rarity's probability, exactly like the old
+    per-draw ``random.choices`` call, but the cumulative weights are
+    computed once so a draw is a single ``bisect``.
+    """
+
+    def __init__(self, cards, version=None):
+        self.version = version
+        self.cards = [card for card in cards if card.rarity.probability > 0]
+        self.cum_weights = list(accumulate(card.rarity.probability for card in self.cards))
+        self.total = self.cum_weights[-1] if self.cum_weights else 0
+
+    def __len__(self):
+        return len(self.cards)
+
+    def draw(self, k=1, rng=random):
+        if not self.total:
+            raise ValueError("There are no cards available to draw.")
+        last = len(self.cards) - 1
+        return [
+            self.cards[min(bisect_right(self.cum_weights, rng.random() * self.total), last)]
+            for _ in range(k)
+        ]
+
+
+def build_sampler(card_set_id=None, version=None):
+    cards = Card.objects.select_related('rarity').order_by('id')
+    if card_set_id is not None:
+        cards = cards.filter(card_set_id=card_set_id)
+    with on_primary():
+        return CardSampler(cards, version)
+
+
+def get_sampler(card_set_id=None):
+    version = get_catalog_version()
+    sampler = _samplers.get(card_set_id)
+    if sampler is None or sampler.version != version:
+        with _lock:
+            sampler = _samplers.get(card_set_id)
+            if sampler is None or sampler.version != version:
+                sampler = build_sampler(card_set_id, version)
+                _samplers[card_set_id] = sampler
+    return sampler
+
+
+def draw_cards(card_set_id=None, k=1):
+    return get_sampler(card_set_id).draw(k)
@@ -0,0 +1,114 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from WebProjecte.db_router import on_primary
+from WebProjecte.models import Card
+from WebProjecte.services.local_cache import MISSING, LocalCache
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_MODELS = ('Card', 'CardSet', 'Rarity')
+# Old versions are never read again, they only need to outlive a deploy
+CATALOG_CACHE_TIMEOUT = 24 * 3600
+
+# L1 in front of the shared cache. Keys carry versions read from the shared
+# cache, so an entry is never served after a change; the TTL only bounds memory.
+_local = LocalCache(settings.CATALOG_L1_MAX_ENTRIES, settings.CATALOG_L1_TTL)
+
+
+def model_version_key(model_name):
+    return f'{CATALOG_VERSION_KEY}:{model_name}'
+
+
+def _get_versions(keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Start from the clock so a lost key can never bring back an old version
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def get_catalog_version():
+    """Current catalog version, shared by every process using the same cache."""
+    return _get_versions([CATALOG_VERSION_KEY])[0]
+
+
+def get_model_versions(model_names):
+    """Versions of the given catalog models, read with one cache round trip."""
+    return _get_versions([model_version_key(name) for name in model_names])
+
+
+def bump_catalog_version(*model_names):
+    """Invalidate everything derived from the given catalog models, all of them by default.
+
+    The catalog-wide version moves on every change; data that depends on
+    fewer models is keyed by those models' own versions instead.
+    """
+    for name in model_names or CATALOG_MODELS:
+        _incr(model_version_key(name))
+    return _incr(CATALOG_VERSION_KEY)
+
+
+def catalog_key(name, version=None):
+    return f'catalog:{name}:{version if version is not None else get_catalog_version()}'
+
+
+def image_url(name):
+    return Card._meta.get_field('image').storage.url(name) if name else ''
+
+
+def api_card_rows():
+    return Card.objects.order_by('id').values('title', 'image', 'description', 'rarity__title')
+
+
+def api_card_entry(card):
+    return {
+        'name': card['title'],
+        'image': image_url(card['image']),
+        'text': card['description'],
+        'power': '?',
+        'cost': 0,
+        'type': card['rarity__title'],
+    }
+
+
+def get_cached(key, build):
+    """Value for a versioned ``key`` from the L1, then the shared cache, then ``build()``.
+
+    ``build`` runs against the primary database so a lagging replica cannot
+    refill the cache with stale rows.
+    """
+    value = _local.get(key)
+    if value is MISSING:
+        value = cache.get(key)
+        if value is None:
+            with on_primary():
+                value = build()
+            cache.set(key, value, CATALOG_CACHE_TIMEOUT)
+        _local.set(key, value)
+    return value
+
+
+def build_api_cards():
+    data = [api_card_entry(card) for card in api_card_rows()]
+    return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+def get_api_cards_json(version=None):
+    """Serialized ``/api/cards/`` body for the given catalog version."""
+    return get_cached(catalog_key('api_cards', version), build_api_cards)
+
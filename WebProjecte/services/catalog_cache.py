@@ -0,0 +1,70 @@
+from bisect import bisect_left
+
+from WebProjecte.models import Card, CardSet, Rarity
+from WebProjecte.services.catalog import get_cached, get_model_versions
+
+
+def projection_key(name, model_names):
+    """Cache key for ``name``, versioned by the catalog models it is built from."""
+    versions = get_model_versions(model_names)
+    return f'catalog:{name}:' + ':'.join(str(version) for version in versions)
+
+
+def cached_projection(name, model_names, build):
+    """Two-level cached ``build()``, rebuilt only after one of ``model_names`` changes.
+
+    Results are shared between requests and threads: never mutate them.
+    """
+    return get_cached(projection_key(name, model_names), build)
+
+
+def get_rarities():
+    """Rarities, most common first."""
+    return cached_projection('rarities', ['Rarity'], lambda: list(
+        Rarity.objects.order_by('-probability', 'id').values('id', 'title', 'description', 'probability')
+    ))
+
+
+def get_card_sets():
+    """Card sets in creation order, with the stored image name."""
+    return cached_projection('card_sets', ['CardSet'], lambda: [
+        {**card_set, 'image': card_set['image'] or ''}
+        for card_set in CardSet.objects.order_by('id').values('id', 'title', 'description', 'image')
+    ])
+
+
+def get_cards():
+    """``{card id: card}`` for the whole catalog, with rarity and set ids."""
+    return cached_projection('cards', ['Card'], lambda: {
+        card['id']: {**card, 'image': card['image'] or ''}
+        for card in Card.objects.values('id', 'title', 'description', 'image', 'rarity_id', 'card_set_id')
+    })
+
+
+def _build_card_id_lists():
+    lists = {}
+    for card_id, card in sorted(get_cards().items()):
+        card_set_id, rarity_id = card['card_set_id'], card['rarity_id']
+        for key in ((None, None), (card_set_id, None), (None, rarity_id), (card_set_id, rarity_id)):
+            lists.setdefault(key, []).append(card_id)
+    return lists
+
+
+def get_card_ids(card_set_id=None, rarity_id=None):
+    """Card ids in ascending order, for keyset paging over ``get_cards()``.
+
+    Every set, rarity and (set, rarity) pair has its own list, so a filtered
+    page bisects into the cards it can show instead of scanning the catalog.
+    """
+    lists = cached_projection('card_id_lists', ['Card'], _build_card_id_lists)
+    return lists.get((card_set_id, rarity_id), [])
+
+
+def get_card_ids_by_title(prefix):
+    """Ids of the cards whose casefolded title starts with ``prefix``, ascending."""
+    titles = cached_projection('card_titles', ['Card'], lambda: sorted(
+        (card['title'].casefold(), card_id) for card_id, card in get_cards().items()
+    ))
+    start = bisect_left(titles, (prefix,))
+    end = bisect_left(titles, (prefix + '\U0010ffff',))
+    return sorted(card_id for _, card_id in titles[start:end])
@@ -0,0 +1,182 @@
+import csv
+import json
+import os
+from collections import Counter
+from itertools import islice
+
+from django.db import transaction
+
+from WebProjecte.models import Card, CardSet, Rarity
+from WebProjecte.services.catalog import bump_catalog_version
+
+IMPORT_BATCH_SIZE = 1000
+
+
+class CatalogImportError(Exception):
+    pass
+
+
+def read_records(path):
+    """Yield one dict per record from a ``.csv``, ``.jsonl`` or ``.json`` file.
+
+    CSV and JSONL are streamed line by line; a ``.json`` file holds a single
+    array and is parsed whole, so prefer JSONL for very large imports.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8', newline='') as f:
+        if extension == '.csv':
+            yield from csv.DictReader(f)
+        elif extension == '.jsonl':
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        elif extension == '.json':
+            records = json.load(f)
+            if not isinstance(records, list):
+                raise CatalogImportError(f"{path}: expected a JSON array")
+            yield from records
+        else:
+            raise CatalogImportError(f"{path}: unsupported format, use .csv, .json or .jsonl")
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _text(record, name):
+    value = record.get(name)
+    return '' if value is None else str(value).strip()
+
+
+def _required(record, name):
+    value = _text(record, name)
+    if not value:
+        raise CatalogImportError(f"Missing '{name}' in {record!r}")
+    return value
+
+
+class Importer:
+    """Upserts catalog records batch by batch, keyed on their natural keys.
+
+    Rarities and card sets are keyed by title and cards by (set, title).
+    Every batch is compared with the stored rows in one query, so only new
+    or changed rows are written, with one ``bulk_create(update_conflicts=True)``
+    per batch. ``report`` receives one diff line per created or updated row.
+    """
+
+    def __init__(self, dry_run=False, batch_size=IMPORT_BATCH_SIZE, report=None):
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.report = report or (lambda line: None)
+        self.stats = {'rarity': Counter(), 'set': Counter(), 'card': Counter()}
+        self.rarity_ids = dict(Rarity.objects.values_list('title', 'id'))
+        self.set_ids = dict(CardSet.objects.values_list('title', 'id'))
+
+    def import_rarities(self, records):
+        for batch in _batches(records, self.batch_size):
+            rows = {}
+            for record in batch:
+                title = _required(record, 'title')
+                try:
+                    probability = float(record.get('probability'))
+                except (TypeError, ValueError):
+                    raise CatalogImportError(f"Rarity '{title}' needs a numeric probability")
+                rows[(title,)] = (title, {'title': title, 'description': _text(record, 'description'),
+                                          'probability': probability})
+            self._upsert('rarity', Rarity, ('title',), ('description', 'probability'), rows)
+            self._refresh_ids(Rarity, self.rarity_ids, rows)
+
+    def import_sets(self, records):
+        for batch in _batches(records, self.batch_size):
+            rows = {}
+            for record in batch:
+                title = _required(record, 'title')
+                rows[(title,)] = (title, {'title': title, 'description': _text(record, 'description'),
+                                          'image': _text(record, 'image')})
+            self._upsert('set', CardSet, ('title',), ('description', 'image'), rows)
+            self._refresh_ids(CardSet, self.set_ids, rows)
+
+    def import_cards(self, records):
+        for batch in _batches(records, self.batch_size):
+            rows = {}
+            for record in batch:
+                title = _required(record, 'title')
+                set_title = _required(record, 'set')
+                card_set_id = self._resolve(self.set_ids, 'set', set_title, title)
+                rarity_id = self._resolve(self.rarity_ids, 'rarity', _required(record, 'rarity'), title)
+                rows[(card_set_id, title)] = (f'{set_title} / {title}', {
+                    'card_set_id': card_set_id, 'title': title, 'description': _text(record, 'description'),
+                    'image': _text(record, 'image'), 'rarity_id': rarity_id,
+                })
+            self._upsert('card', Card, ('card_set_id', 'title'), ('description', 'image', 'rarity_id'), rows)
+
+    @staticmethod
+    def _resolve(ids, kind, title, card_title):
+        if title not in ids:
+            raise CatalogImportError(f"Card '{card_title}' refers to unknown {kind} '{title}'")
+        return ids[title]
+
+    def _refresh_ids(self, model, ids, rows):
+        missing = [title for (title,) in rows if title not in ids]
+        if not missing:
+            return
+        if self.dry_run:
+            # Rows a dry run would create get placeholder ids no stored row can match
+            for title in missing:
+                ids[title] = -len(ids) - 1
+        else:
+            ids.update(model.objects.filter(title__in=missing).values_list('title', 'id'))
+
+    def _upsert(self, kind, model, key_fields, update_fields, rows):
+        fields = (*key_fields, *update_fields)
+        # Matches a superset of the batch's keys, the exact pairs are checked below
+        lookup = {f'{name}__in': {key[i] for key in rows} for i, name in enumerate(key_fields)}
+        existing = {
+            tuple(values[:len(key_fields)]): values[len(key_fields):]
+            for values in model.objects.filter(**lookup).values_list(*fields)
+        }
+
+        changed = []
+        for key, (label, row) in rows.items():
+            if key not in existing:
+                self.stats[kind]['created'] += 1
+                self.report(f"+ {kind} {label}")
+                changed.append(row)
+                continue
+            stored = dict(zip(update_fields, existing[key]))
+            differences = [name for name in update_fields if (stored[name] or '') != (row[name] or '')]
+            if differences:
+                self.stats[kind]['updated'] += 1
+                self.report(f"~ {kind} {label}: {', '.join(differences)}")
+                changed.append(row)
+            else:
+                self.stats[kind]['unchanged'] += 1
+
+        if changed and not self.dry_run:
+            model.objects.bulk_create(
+                [model(**row) for row in changed],
+                update_conflicts=True,
+                unique_fields=[name.removesuffix('_id') for name in key_fields],
+                update_fields=[name.removesuffix('_id') for name in update_fields],
+            )
+
+
+def import_catalog(rarities=None, sets=None, cards=None, dry_run=False, batch_size=IMPORT_BATCH_SIZE, report=None):
+    """Import catalog files in dependency order. Returns the per-kind counters.
+
+    The whole import is one transaction, so a bad record leaves the catalog
+    untouched. ``dry_run`` computes the same diff without writing anything.
+    """
+    importer = Importer(dry_run=dry_run, batch_size=batch_size, report=report)
+    with transaction.atomic():
+        for path, run in ((rarities, importer.import_rarities), (sets, importer.import_sets),
+                          (cards, importer.import_cards)):
+            if path:
+                run(read_records(path))
+        # bulk_create sends no post_save, so catalog caches are invalidated here
+        if not dry_run and any(stats['created'] or stats['updated'] for stats in importer.stats.values()):
+            bump_catalog_version()
+            transaction.on_commit(bump_catalog_version)
+    return importer.stats
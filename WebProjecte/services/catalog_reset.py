@@ -0,0 +1,76 @@
+from django.db import transaction
+
+from WebProjecte.models import Card, CardSet, CollectionCard, Rarity, UserCard
+from WebProjecte.services.bulk_delete import DELETE_BATCH_SIZE, delete_in_batches, raw_delete
+from WebProjecte.services.catalog import bump_catalog_version
+from WebProjecte.services.file_cleanup import queue_file_deletion
+from WebProjecte.services.ownership import invalidate_ownership
+
+
+def _invalidate_owners(card_ids):
+    user_ids = list(
+        CollectionCard.objects.filter(card_id__in=card_ids).values_list('collection__user_id', flat=True).distinct()
+    )
+
+    def invalidate():
+        for user_id in user_ids:
+            invalidate_ownership(user_id)
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+def _delete_collection_entries(card_ids):
+    _invalidate_owners(card_ids)
+    raw_delete(CollectionCard.objects.filter(card_id__in=card_ids))
+
+
+def _delete_user_cards(rarity_ids):
+    user_cards = UserCard.objects.filter(rarity_id__in=rarity_ids)
+    queue_file_deletion(user_cards.values_list('image', flat=True))
+    raw_delete(user_cards)
+
+
+def reset_catalog(set_ids=None, keep_collections=False, keep_user_cards=False,
+                  batch_size=DELETE_BATCH_SIZE, progress=None):
+    """Delete catalog rows in bounded batches. Returns ``{model name: rows deleted}``.
+
+    With ``set_ids`` only those sets and their cards go and rarities stay;
+    otherwise the whole catalog is cleared. ``keep_collections`` spares the
+    cards someone owns (and so their sets and rarities), ``keep_user_cards``
+    spares the rarities custom user cards use. Otherwise the rows referencing
+    what is deleted are removed in the same batch, user card images through
+    the ``sweep_files`` queue.
+    """
+    report = progress or (lambda model, deleted: None)
+    cards = Card.objects.all()
+    sets = CardSet.objects.all()
+    if set_ids is not None:
+        cards = cards.filter(card_set_id__in=set_ids)
+        sets = sets.filter(id__in=set_ids)
+    if keep_collections:
+        cards = cards.exclude(id__in=CollectionCard.objects.values('card_id'))
+
+    deleted = {}
+    deleted['Card'] = delete_in_batches(
+        cards, batch_size, before_batch=_delete_collection_entries,
+        progress=lambda count: report('Card', count),
+    )
+    # Sets and rarities still used by a kept card stay
+    deleted['CardSet'] = delete_in_batches(
+        sets.exclude(id__in=Card.objects.values('card_set_id')), batch_size,
+        progress=lambda count: report('CardSet', count),
+    )
+    if set_ids is None:
+        rarities = Rarity.objects.exclude(id__in=Card.objects.values('rarity_id'))
+        if keep_user_cards:
+            rarities = rarities.exclude(id__in=UserCard.objects.values('rarity_id'))
+        deleted['Rarity'] = delete_in_batches(
+            rarities, batch_size, before_batch=_delete_user_cards,
+            progress=lambda count: report('Rarity', count),
+        )
+
+    # Raw deletes send no signals, so catalog caches are invalidated here
+    if any(deleted.values()):
+        bump_catalog_version()
+    return deleted
@@ -0,0 +1,28 @@
+from django.core.files.storage import default_storage
+
+from WebProjecte.models import PendingFileDeletion, Profile, UserCard
+from WebProjecte.services.thumbnails import delete_thumbnails
+
+
+def queue_file_deletion(names):
+    """Record storage files to delete later, off the request path."""
+    PendingFileDeletion.objects.bulk_create([PendingFileDeletion(name=name) for name in names if name])
+
+
+def sweep(batch_size=500, storage=default_storage):
+    """Delete one batch of queued files and their thumbnails. Returns the batch size."""
+    batch = list(PendingFileDeletion.objects.order_by('pk').values_list('pk', 'name')[:batch_size])
+    if not batch:
+        return 0
+
+    names = {name for _, name in batch}
+    # A name can be reused by a newer upload once the old file is gone
+    in_use = set(UserCard.objects.filter(image__in=names).values_list('image', flat=True))
+    in_use.update(Profile.objects.filter(profile_image__in=names).values_list('profile_image', flat=True))
+    for name in names - in_use:
+        delete_thumbnails(name, storage)
+        if storage.exists(name):
+            storage.delete(name)
+
+    PendingFileDeletion.objects.filter(pk__in=[pk for pk, _ in batch]).delete()
+    return len(batch)
@@ -0,0 +1,185 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import content_disposition_header, http_date
+
+# Pre-compressed siblings written by collectstatic, best first
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+RANGE_BLOCK_SIZE = 64 * 1024
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(RANGE_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+async def _aread_range(path, start, length):
+    """``_read_range`` for ASGI, each block read in a worker thread.
+
+    ASGI reads synchronous iterators whole into memory before sending them.
+    """
+    blocks = _read_range(path, start, length)
+    read = sync_to_async(next, thread_sensitive=False)
+    try:
+        while (block := await read(blocks, None)) is not None:
+            yield block
+    finally:
+        await sync_to_async(blocks.close, thread_sensitive=False)()
+
+
+def _range_body(request, path, start, length):
+    if isinstance(request, ASGIRequest):
+        return _aread_range(path, start, length)
+    return _read_range(path, start, length)
+
+
+def _file_response(request, path, content_type, filename):
+    if isinstance(request, ASGIRequest):
+        size = os.path.getsize(path)
+        response = StreamingHttpResponse(_aread_range(path, 0, size), content_type=content_type)
+        response['Content-Length'] = str(size)
+        response['Content-Disposition'] = content_disposition_header(False, filename)
+        return response
+    # FileResponse lets the WSGI server use sendfile() through wsgi.file_wrapper
+    return FileResponse(open(path, 'rb'), content_type=content_type, filename=filename)
+
+
+def _parse_range(header, size):
+    """``(start, end)`` for a single satisfiable byte range, ``None`` to send everything,
+    or ``False`` when the range cannot be satisfied."""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start, end = max(0, size - int(last)), size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _encoding_qualities(header):
+    """``{coding: q}`` parsed from an ``Accept-Encoding`` header."""
+    qualities = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def _pick_encoding(header, full_path):
+    # Highest q wins, ties go to the better compression; q=0 means not acceptable
+    qualities = _encoding_qualities(header)
+    best, best_quality = None, 0.0
+    for name, suffix in PRECOMPRESSED:
+        quality = qualities.get(name, qualities.get('*', 0.0))
+        if quality > best_quality and os.path.isfile(full_path + suffix):
+            best, best_quality = name, quality
+    return best
+
+
+def serve_file(request, path, document_root, max_age, immutable=False, sendfile_header='',
+               sendfile_prefix=''):
+    """Serve ``path`` under ``document_root`` without loading it into memory.
+
+    Answers conditional requests with 304, honours single byte ranges, prefers
+    ``.br``/``.gz`` siblings when the client accepts them and, when
+    ``sendfile_header`` is set, hands the transfer off to the front server
+    with ``X-Accel-Redirect`` (nginx) or ``X-Sendfile`` (Apache, lighttpd).
+    Under ASGI the body is read block by block in worker threads.
+    A ``max_age`` of 0 sends ``no-cache``: caches keep the file but revalidate
+    it with the ETag or Last-Modified on every use.
+    """
+    # Raises SuspiciousFileOperation (400) for paths escaping document_root
+    full_path = safe_join(document_root, path)
+    if not os.path.isfile(full_path):
+        raise Http404("File not found")
+
+    content_type, _ = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    stat = os.stat(full_path)
+
+    # Pick the representation first, each one has its own ETag
+    encoding = None
+    if not sendfile_header and 'Range' not in request.headers:
+        encoding = _pick_encoding(request.headers.get('Accept-Encoding', ''), full_path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        if sendfile_header == 'X-Accel-Redirect':
+            response = HttpResponse(content_type=content_type)
+            response[sendfile_header] = sendfile_prefix + quote(path)
+        elif sendfile_header:
+            response = HttpResponse(content_type=content_type)
+            response[sendfile_header] = full_path
+        elif encoding:
+            suffix = dict(PRECOMPRESSED)[encoding]
+            response = _file_response(request, full_path + suffix, content_type, os.path.basename(full_path))
+            response['Content-Encoding'] = encoding
+        else:
+            response = _identity_response(request, full_path, stat, content_type, etag)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if max_age:
+        patch_cache_control(response, public=True, max_age=max_age, immutable=immutable or None)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def _identity_response(request, full_path, stat, content_type, etag):
+    size = stat.st_size
+    range_header = request.headers.get('Range', '')
+    # A range only applies to the version of the file the client already has
+    if_range = request.headers.get('If-Range')
+    if range_header and (not if_range or if_range in (etag, http_date(stat.st_mtime))):
+        byte_range = _parse_range(range_header, size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _range_body(request, full_path, start, end - start + 1), status=206, content_type=content_type,
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+            response['Accept-Ranges'] = 'bytes'
+            return response
+
+    response = _file_response(request, full_path, content_type, os.path.basename(full_path))
+    response['Accept-Ranges'] = 'bytes'
+    return response
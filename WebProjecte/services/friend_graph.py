@@ -0,0 +1,95 @@
+from array import array
+from collections import Counter
+
+from django.core.cache import cache
+
+from WebProjecte.db_router import on_primary
+from WebProjecte.models import Profile
+
+FRIENDS_CACHE_TIMEOUT = 24 * 3600
+SUGGESTION_LIMIT = 5
+
+Friendship = Profile.friends.through
+
+
+def friends_key(user_id):
+    return f'friends:{user_id}'
+
+
+def _load(user_id):
+    # The symmetrical M2M stores both directions, so one side is enough
+    return (
+        Friendship.objects.filter(from_profile__user_id=user_id)
+        .values_list('to_profile__user_id', flat=True)
+    )
+
+
+def _pack(user_ids):
+    return array('Q', sorted(user_ids)).tobytes()
+
+
+def _unpack(data):
+    ids = array('Q')
+    ids.frombytes(data)
+    return frozenset(ids)
+
+
+def get_friend_ids(user_id):
+    """Cached set of the user ids ``user_id`` is friends with."""
+    data = cache.get(friends_key(user_id))
+    if data is None:
+        with on_primary():
+            data = _pack(_load(user_id))
+        cache.set(friends_key(user_id), data, FRIENDS_CACHE_TIMEOUT)
+    return _unpack(data)
+
+
+def get_many_friend_ids(user_ids):
+    """``{user_id: friend ids}`` with one cache round trip, loading only the misses."""
+    user_ids = list(user_ids)
+    cached = cache.get_many([friends_key(user_id) for user_id in user_ids])
+    graph = {}
+    missing = []
+    for user_id in user_ids:
+        data = cached.get(friends_key(user_id))
+        if data is None:
+            missing.append(user_id)
+        else:
+            graph[user_id] = _unpack(data)
+    if missing:
+        loaded = {user_id: [] for user_id in missing}
+        rows = Friendship.objects.filter(from_profile__user_id__in=missing).values_list(
+            'from_profile__user_id', 'to_profile__user_id',
+        )
+        with on_primary():
+            for user_id, friend_id in rows:
+                loaded[user_id].append(friend_id)
+        cache.set_many({friends_key(user_id): _pack(ids) for user_id, ids in loaded.items()}, FRIENDS_CACHE_TIMEOUT)
+        graph.update((user_id, frozenset(ids)) for user_id, ids in loaded.items())
+    return graph
+
+
+def invalidate_friends(*user_ids):
+    cache.delete_many([friends_key(user_id) for user_id in user_ids])
+
+
+def are_friends(user_id, other_id):
+    return other_id in get_friend_ids(user_id)
+
+
+def friend_count(user_id):
+    return len(get_friend_ids(user_id))
+
+
+def suggest_friends(user_id, limit=SUGGESTION_LIMIT):
+    """Friends of friends ranked by how many mutual friends they share.
+
+    Returns ``[(user_id, mutual_count)]``, best first, ties by lowest id.
+    """
+    friends = get_friend_ids(user_id)
+    counts = Counter()
+    for friend_ids in get_many_friend_ids(friends).values():
+        counts.update(friend_ids)
+    for excluded in friends | {user_id}:
+        counts.pop(excluded, None)
+    return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
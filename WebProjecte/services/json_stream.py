@@ -0,0 +1,72 @@
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+# Rows fetched per database round trip when walking a queryset
+STREAM_CHUNK_SIZE = 2000
+# Items serialized together into one chunk of the response body
+STREAM_BATCH_SIZE = 500
+
+
+def iter_json_array(items, batch_size=STREAM_BATCH_SIZE):
+    """Yield a JSON array piece by piece, ``batch_size`` items per chunk."""
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    yield '['
+    batch = []
+    separator = ''
+    for item in items:
+        batch.append(encoder.encode(item))
+        if len(batch) >= batch_size:
+            yield separator + ','.join(batch)
+            separator = ','
+            batch = []
+    if batch:
+        yield separator + ','.join(batch)
+    yield ']'
+
+
+async def aiter_json_array(items, batch_size=STREAM_BATCH_SIZE):
+    """``iter_json_array`` for an async iterable, as served under ASGI."""
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    yield '['
+    batch = []
+    separator = ''
+    async for item in items:
+        batch.append(encoder.encode(item))
+        if len(batch) >= batch_size:
+            yield separator + ','.join(batch)
+            separator = ','
+            batch = []
+    if batch:
+        yield separator + ','.join(batch)
+    yield ']'
+
+
+def streaming_json_response(items, filename=None):
+    """Stream ``items`` (any iterable of JSON-serializable values) as a JSON array.
+
+    Querysets go through ``stream_queryset`` instead. ASGI buffers
+    synchronous iterators whole before sending them, so pass async iterables
+    to ASGI requests.
+    """
+    content = aiter_json_array(items) if hasattr(items, '__aiter__') else iter_json_array(items)
+    response = StreamingHttpResponse(content, content_type='application/json')
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def stream_queryset(request, queryset, entry, filename=None):
+    """Stream ``entry(row)`` for every row of ``queryset`` as a JSON array.
+
+    The body is read after the view has returned, when the request's replica
+    routing is gone, so the queryset is bound to the database it reads from
+    now. Rows are fetched ``STREAM_CHUNK_SIZE`` at a time: with ``aiterator``
+    under ASGI, with a plain iterator under WSGI.
+    """
+    queryset = queryset.using(queryset.db)
+    if isinstance(request, ASGIRequest):
+        items = (entry(row) async for row in queryset.aiterator(chunk_size=STREAM_CHUNK_SIZE))
+    else:
+        items = map(entry, queryset.iterator(chunk_size=STREAM_CHUNK_SIZE))
+    return streaming_json_response(items, filename)
@@ -0,0 +1,48 @@
+from django.core.cache import cache
+
+from WebProjecte.db_router import on_primary
+from WebProjecte.models import CollectionCard
+
+OWNERSHIP_CACHE_TIMEOUT = 24 * 3600
+
+
+class OwnershipBitmap:
+    """Set of owned card ids packed one bit per card id."""
+
+    def __init__(self, data=b''):
+        self.data = bytes(data)
+
+    @classmethod
+    def from_ids(cls, card_ids):
+        card_ids = list(card_ids)
+        data = bytearray(max(card_ids, default=-1) // 8 + 1)
+        for card_id in card_ids:
+            data[card_id >> 3] |= 1 << (card_id & 7)
+        return cls(data)
+
+    def __contains__(self, card_id):
+        index = card_id >> 3
+        return index < len(self.data) and bool(self.data[index] & (1 << (card_id & 7)))
+
+    def __len__(self):
+        return sum(byte.bit_count() for byte in self.data)
+
+
+def ownership_key(user_id):
+    return f'ownership:{user_id}'
+
+
+def get_ownership(user_id):
+    """Cached bitmap of the card ids in the user's collection."""
+    data = cache.get(ownership_key(user_id))
+    if data is None:
+        card_ids = CollectionCard.objects.filter(collection__user_id=user_id).values_list('card_id', flat=True)
+        with on_primary():
+            bitmap = OwnershipBitmap.from_ids(card_ids)
+        cache.set(ownership_key(user_id), bitmap.data, OWNERSHIP_CACHE_TIMEOUT)
+        return bitmap
+    return OwnershipBitmap(data)
+
+
+def invalidate_ownership(user_id):
+    cache.delete(ownership_key(user_id))
@@ -1,27 +1,23 @@
 import random
 import string
 from django.core.files.base import ContentFile
-import requests
+from WebProjecte.services.avatar_renderer import render_avatar
 
-def generate_avatar(user):
+def random_seed():
+    return ''.join(random.choices(string.ascii_lowercase + string.digits, k=10))
+
+def fetch_avatar(seed=None, style="robot"):
+    """PNG bytes of an avatar rendered locally, random unless ``seed`` is given."""
+    return render_avatar(seed or random_seed(), style)
 
-    # Random seed
-    seed = ''.join(random.choices(string.ascii_lowercase + string.digits, k=10))
-    style = "bottts" 
-    
-    # URL for DiceBear API
-    url = f"https://api.dicebear.com/7.x/{style}/png?seed={seed}&backgroundColor=b6e3f4"
-    
+def save_avatar(user, content):
+    # Save the avatar to the user's profile
+    filename = f"avatar_{user.username}.png"
+    user.profile.profile_image.save(filename, ContentFile(content), save=True)
+
+def generate_avatar(user):
     try:
-        # Get the avatar image
-        response = requests.get(url)
-        response.raise_for_status()  # Raise exception for 4XX/5XX responses
-        
-        # Save the avatar to the user's profile
-        if response.content:
-            filename = f"avatar_{user.username}.png"
-            user.profile.profile_image.save(filename, ContentFile(response.content), save=True)
-            return True
+        save_avatar(user, fetch_avatar())
+        return True
+    except OSError:
         return False
-    except requests.RequestException:
-        return False
\ No newline at end of file
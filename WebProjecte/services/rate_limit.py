@@ -0,0 +1,20 @@
+import time
+
+from django.core.cache import cache
+
+
+def rate_limited(key, limit, window):
+    """Count a hit on ``key`` and tell whether it went over ``limit`` per ``window`` seconds.
+
+    Hits are counted in fixed windows in the shared cache, so every process
+    sees the same count.
+    """
+    bucket = f'ratelimit:{key}:{int(time.time() // window)}'
+    cache.add(bucket, 0, window)
+    try:
+        count = cache.incr(bucket)
+    except ValueError:
+        # The bucket expired between add and incr
+        cache.set(bucket, 1, window)
+        count = 1
+    return count > limit
@@ -0,0 +1,119 @@
+import hashlib
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+# Widths served through srcset, smallest first
+THUMBNAIL_WIDTHS = (160, 320, 640)
+THUMBNAIL_FORMAT, THUMBNAIL_EXT = ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+THUMBNAIL_QUALITY = 80
+
+# Width of an original's derivatives, misses (0) included, so srcset needs no file system check
+THUMBNAIL_CACHE_TIMEOUT = 24 * 3600
+
+
+def thumbnail_name(name, width):
+    """``card_images/foo.png`` -> ``card_images/foo.png.w320.webp``, stored next to the original.
+
+    The original's extension stays in the name, so ``foo.png`` and ``foo.jpg``
+    never share derivatives.
+    """
+    return f'{name}.w{width}.{THUMBNAIL_EXT}'
+
+
+def thumbnails_key(name):
+    # Storage names may hold characters some cache backends reject in keys
+    return f'thumbnail_width:{hashlib.sha1(name.encode()).hexdigest()}'
+
+
+def thumbnail_width(name, storage):
+    """Real width of the largest derivative of ``name``, 0 while there are none.
+
+    Narrow originals are re-encoded at their own size, so this is the
+    original's width capped at the largest ``THUMBNAIL_WIDTHS``.
+    """
+    width = cache.get(thumbnails_key(name))
+    if width is None:
+        width = 0
+        # The largest width is written last, so its presence means the set is complete
+        target = thumbnail_name(name, THUMBNAIL_WIDTHS[-1])
+        if storage.exists(target):
+            try:
+                with storage.open(target, 'rb') as f:
+                    # Only the header is read
+                    width = Image.open(f).size[0]
+            except OSError:
+                pass
+        cache.set(thumbnails_key(name), width, THUMBNAIL_CACHE_TIMEOUT)
+    return width
+
+
+def has_thumbnails(name, storage):
+    return thumbnail_width(name, storage) > 0
+
+
+def generate_thumbnails(name, storage, force=False):
+    """Write every derivative width for ``name``. Returns how many were written.
+
+    Images are only ever scaled down; a narrow original is re-encoded at its
+    own size for the larger widths so srcset stays complete.
+    """
+    if not name or (not force and has_thumbnails(name, storage)):
+        return 0
+    try:
+        with storage.open(name, 'rb') as f:
+            original = ImageOps.exif_transpose(Image.open(f))
+            original.load()
+    except (FileNotFoundError, OSError):
+        return 0
+
+    if THUMBNAIL_FORMAT == 'JPEG' or original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGB' if THUMBNAIL_FORMAT == 'JPEG' else 'RGBA')
+
+    written = 0
+    for width in THUMBNAIL_WIDTHS:
+        image = original.copy()
+        image.thumbnail((width, width * 10), Image.LANCZOS)
+        real_width = image.size[0]
+        buffer = BytesIO()
+        image.save(buffer, format=THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+        target = thumbnail_name(name, width)
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(buffer.getvalue()))
+        written += 1
+    cache.set(thumbnails_key(name), real_width, THUMBNAIL_CACHE_TIMEOUT)
+    return written
+
+
+def delete_thumbnails(name, storage):
+    if not name:
+        return
+    cache.set(thumbnails_key(name), 0, THUMBNAIL_CACHE_TIMEOUT)
+    for width in THUMBNAIL_WIDTHS:
+        target = thumbnail_name(name, width)
+        if storage.exists(target):
+            storage.delete(target)
+
+
+def srcset(name, storage):
+    """``srcset`` attribute value for ``name``, or ``''`` until derivatives exist.
+
+    Every candidate carries its real width: derivatives of a narrow original
+    share its width and are listed once.
+    """
+    largest = thumbnail_width(name, storage) if name else 0
+    if not largest:
+        return ''
+    candidates = {}
+    for width in THUMBNAIL_WIDTHS:
+        candidates.setdefault(min(width, largest), width)
+    return ', '.join(
+        f'{storage.url(thumbnail_name(name, width))} {real_width}w' for real_width, width in candidates.items()
+    )
+
+
+def field_srcset(field_file):
+    return srcset(field_file.name, field_file.storage) if field_file else ''
@@ -0,0 +1,78 @@
+import unicodedata
+
+from django.db import connection
+from django.db.models import Exists, OuterRef, Q, Subquery
+
+from WebProjecte.models import FriendRequest, Profile
+from WebProjecte.services.friend_graph import get_many_friend_ids
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 50
+# Substring matches need the pg_trgm index to stay fast, and 3 characters to use it
+TRIGRAM_MIN_LENGTH = 3
+# Sorts after every character that can follow the prefix
+PREFIX_UPPER_BOUND = '\U0010ffff'
+
+
+def normalize_username(username):
+    """Form stored in ``Profile.search_name``: NFKC, case folded."""
+    return unicodedata.normalize('NFKC', username or '').casefold()
+
+
+def use_trigram(term):
+    return connection.vendor == 'postgresql' and len(term) >= TRIGRAM_MIN_LENGTH
+
+
+def search_users(user, query, after=None, limit=SEARCH_PAGE_SIZE):
+    """One page of users matching ``query``, excluding ``user``.
+
+    Matches on the normalized username: a prefix range scan on the
+    ``search_name`` index, or a substring match on PostgreSQL where the
+    trigram index serves it. Pages are keyset paginated on
+    ``(search_name, user_id)``; ``after`` is the last row's pair.
+
+    Every row also says whether a request was sent to it and the id of a
+    request received from it, from the same query, plus whether it is
+    already a friend and how many friends it shares with ``user``, from the
+    cached friend graph. Returns ``(rows, next_after)``.
+    """
+    term = normalize_username(query).strip()
+    if not term:
+        return [], None
+    limit = max(1, min(limit, SEARCH_MAX_PAGE_SIZE))
+
+    profiles = Profile.objects.exclude(user_id=user.id)
+    if use_trigram(term):
+        profiles = profiles.filter(search_name__contains=term)
+    else:
+        # The range lets any B-tree index narrow the scan, startswith keeps it exact
+        profiles = profiles.filter(
+            search_name__gte=term, search_name__lt=term + PREFIX_UPPER_BOUND, search_name__startswith=term,
+        )
+    if after is not None:
+        name, user_id = after
+        profiles = profiles.filter(Q(search_name__gt=name) | Q(search_name=name, user_id__gt=user_id))
+
+    received = FriendRequest.objects.filter(from_user=OuterRef('user_id'), to_user_id=user.id)
+    rows = list(
+        profiles
+        .annotate(
+            request_sent=Exists(FriendRequest.objects.filter(from_user_id=user.id, to_user=OuterRef('user_id'))),
+            received_request_id=Subquery(received.values('id')[:1]),
+        )
+        .order_by('search_name', 'user_id')
+        .values('user_id', 'user__username', 'search_name', 'request_sent', 'received_request_id')
+        [:limit + 1]
+    )
+    next_after = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_after = (last['search_name'], last['user_id'])
+    rows = rows[:limit]
+
+    graph = get_many_friend_ids([user.id, *(row['user_id'] for row in rows)])
+    friend_ids = graph[user.id]
+    for row in rows:
+        row['is_friend'] = row['user_id'] in friend_ids
+        row['mutual'] = len(friend_ids & graph[row['user_id']])
+    return rows, next_after
@@ -1,6 +1,14 @@
-from django.db.models.signals import pre_save, post_delete
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
-from .models import Profile
+from django.db import transaction
+from django.db.models import DEFERRED
+from django.contrib.auth.models import User
+from .models import Profile, Card, CardSet, Rarity, Collection, CollectionCard, UserCard
+from .services.catalog import bump_catalog_version
+from .services.ownership import invalidate_ownership
+from .services.friend_graph import Friendship, invalidate_friends
+from .services.thumbnails import delete_thumbnails, generate_thumbnails
+from .services.user_search import normalize_username
 import os
 
 @receiver(pre_save, sender=Profile)
@@ -8,19 +16,109 @@ def delete_old_profile_image(sender, instance, **kwargs):
     if not instance.pk:
         return
 
-    try:
-        old_instance = Profile.objects.get(pk=instance.pk)
-    except Profile.DoesNotExist:
-        return
+    old_name = instance.loaded_profile_image
+    if old_name is DEFERRED:
+        # Only instances not loaded through the ORM need the lookup
+        old_name = Profile.objects.filter(pk=instance.pk).values_list('profile_image', flat=True).first()
+
+    storage = instance.profile_image.storage
+    if old_name and old_name != instance.profile_image.name:
+        delete_thumbnails(old_name, storage)
+        storage.delete(old_name)
 
-    old_image = old_instance.profile_image
-    new_image = instance.profile_image
+@receiver(pre_save, sender=Profile)
+def set_search_name(sender, instance, **kwargs):
+    # The user is cached whenever it was just created or edited through the profile
+    if Profile.user.is_cached(instance):
+        instance.search_name = normalize_username(instance.user.username)
 
-    if old_image and old_image != new_image:
-        old_image.delete(save=False)
+@receiver(post_save, sender=User)
+def sync_search_name(sender, instance, created, update_fields=None, **kwargs):
+    # Saves that cannot touch the username, like the last_login update, need no query
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    search_name = normalize_username(instance.username)
+    Profile.objects.filter(user=instance).exclude(search_name=search_name).update(search_name=search_name)
 
 @receiver(post_delete, sender=Profile)
 def delete_profile_image_file(sender, instance, **kwargs):
     if instance.profile_image and instance.profile_image.path:
+        delete_thumbnails(instance.profile_image.name, instance.profile_image.storage)
         if os.path.isfile(instance.profile_image.path):
             os.remove(instance.profile_image.path)
+
+
+@receiver(post_save, sender=Card)
+@receiver(post_delete, sender=Card)
+@receiver(post_save, sender=CardSet)
+@receiver(post_delete, sender=CardSet)
+@receiver(post_save, sender=Rarity)
+@receiver(post_delete, sender=Rarity)
+def invalidate_catalog(sender, **kwargs):
+    # Pack samplers and cached catalog responses are keyed by these versions.
+    # Bump again on commit so nothing rebuilt from uncommitted rows survives.
+    bump_catalog_version(sender.__name__)
+    transaction.on_commit(lambda: bump_catalog_version(sender.__name__))
+
+
+@receiver(post_save, sender=CollectionCard)
+@receiver(post_delete, sender=CollectionCard)
+def invalidate_collection_ownership(sender, instance, created=True, **kwargs):
+    # Quantity changes do not affect which cards are owned
+    if not created:
+        return
+    user_id = Collection.objects.filter(pk=instance.collection_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        invalidate_ownership(user_id)
+        transaction.on_commit(lambda: invalidate_ownership(user_id))
+
+
+
+def _invalidate_friends_now_and_on_commit(user_ids):
+    user_ids = list(user_ids)
+    invalidate_friends(*user_ids)
+    transaction.on_commit(lambda: invalidate_friends(*user_ids))
+
+
+@receiver(m2m_changed, sender=Friendship)
+def invalidate_friend_graph(sender, instance, action, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # The cleared friends are unknown once the rows are gone
+        instance._cleared_friend_ids = list(
+            sender.objects.filter(from_profile=instance).values_list('to_profile__user_id', flat=True)
+        )
+    elif action == 'post_clear':
+        _invalidate_friends_now_and_on_commit([instance.user_id, *getattr(instance, '_cleared_friend_ids', [])])
+    elif action in ('post_add', 'post_remove') and pk_set:
+        friend_ids = Profile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True)
+        _invalidate_friends_now_and_on_commit([instance.user_id, *friend_ids])
+
+
+@receiver(pre_delete, sender=Profile)
+def invalidate_deleted_profile_friends(sender, instance, **kwargs):
+    # Cascaded friendship rows do not send m2m_changed
+    friend_ids = Friendship.objects.filter(from_profile=instance).values_list('to_profile__user_id', flat=True)
+    _invalidate_friends_now_and_on_commit([instance.user_id, *friend_ids])
+
+# Image field of every model that gets responsive derivatives
+THUMBNAIL_FIELDS = {Card: 'image', CardSet: 'image', UserCard: 'image', Profile: 'profile_image'}
+
+
+@receiver(post_save, sender=Card)
+@receiver(post_save, sender=CardSet)
+@receiver(post_save, sender=UserCard)
+@receiver(post_save, sender=Profile)
+def build_image_thumbnails(sender, instance, **kwargs):
+    image = getattr(instance, THUMBNAIL_FIELDS[sender])
+    if not image:
+        return
+    name, storage = image.name, image.storage
+
+    def build():
+        # No-op when the derivatives already exist
+        if generate_thumbnails(name, storage) and sender in (Card, CardSet):
+            # Runs after the commit-time catalog bump, so drop fragments rendered without srcset
+            bump_catalog_version(sender.__name__)
+
+    # Encoded once the save has committed, outside its transaction
+    transaction.on_commit(build)
@@ -0,0 +1,38 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # Optional, only gzip copies are written without it
+    brotli = None
+
+# Text formats worth compressing; images and fonts are already compressed
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.map')
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Hashed static files plus ``.gz`` and ``.br`` copies for the file server."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in self.hashed_files.values():
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(self.path(name))
+
+    def compress(self, path):
+        with open(path, 'rb') as f:
+            content = f.read()
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(content))
+        # Keep the copies' timestamps in line with the original for ETags
+        stat = os.stat(path)
+        for suffix in ('.gz', '.br'):
+            if os.path.exists(path + suffix):
+                os.utime(path + suffix, ns=(stat.st_atime_ns, stat.st_mtime_ns))
@@ -0,0 +1,24 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'tests',
+}}
+
+
+class TestRunner(DiscoverRunner):
+    """Runs the tests on a private in-memory cache.
+
+    The default cache is shared with the running site: tests would fill it
+    with their catalog under live versions and wipe it with ``cache.clear()``.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_override = override_settings(CACHES=TEST_CACHES)
+        self.cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_override.disable()
+        super().teardown_test_environment(**kwargs)
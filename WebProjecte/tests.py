@@ -1,13 +1,31 @@
+import gzip
+import json
 import os
 import tempfile
 import time
+from io import BytesIO, StringIO
+from unittest import mock
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from datetime import timedelta
 import geckodriver_autoinstaller
 from PIL import Image
-from django.test import TestCase, Client
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import router
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.staticfiles.testing import StaticLiveServerTestCase
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, connection, connections, transaction
+from django.core.management import CommandError, call_command
+from django.template.loader import get_template
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth import authenticate
 from selenium import webdriver
 from selenium.webdriver.firefox.options import Options
@@ -18,7 +36,25 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.common.exceptions import WebDriverException, ElementClickInterceptedException
-from WebProjecte.models import Card, Rarity, CardSet, Profile, Collection, CollectionCard, UserCard
+from WebProjecte.models import Card, Rarity, CardSet, Profile, Collection, CollectionCard, UserCard, PackStatus, AvatarJob, \
+    PendingFileDeletion, FriendRequest
+from WebProjecte.checks import check_required_indexes
+from WebProjecte.db_router import on_primary, read_from_replica
+from WebProjecte.middleware import PrimaryPinMiddleware
+from WebProjecte.services.account_deletion import delete_user_batch, delete_users
+from WebProjecte.services.avatar_jobs import MAX_ATTEMPTS, run_pending
+from WebProjecte.services.avatar_renderer import AVATAR_STYLES, avatar_png, render_avatar
+from WebProjecte.services.card_sampler import draw_cards, get_sampler
+from WebProjecte.services.catalog import catalog_key, get_api_cards_json, get_catalog_version
+from WebProjecte.services.catalog_cache import get_card_ids, get_card_ids_by_title, get_card_sets, get_cards, get_rarities
+from WebProjecte.services.local_cache import MISSING, LocalCache
+from WebProjecte.services.friend_graph import are_friends, friend_count, get_friend_ids, suggest_friends
+from WebProjecte.services.file_cleanup import queue_file_deletion, sweep
+from WebProjecte.services.json_stream import iter_json_array, stream_queryset
+from WebProjecte.services.ownership import OwnershipBitmap, get_ownership
+from WebProjecte.services.thumbnails import THUMBNAIL_WIDTHS, thumbnail_name
+from WebProjecte.services.user_search import search_users
+from WebProjecte.utils import open_pack
 
 
 class HybridTestBase(StaticLiveServerTestCase):
@@ -485,4 +521,1232 @@ class CleanupHybridTest(HybridTestBase):
             try:
                 user.delete()
             except:
-                pass
\ No newline at end of file
+                pass
+
+class CardSamplerTest(TestCase):
+    """Backend tests for the cached weighted card sampler"""
+
+    def setUp(self):
+        self.common = Rarity.objects.create(title='Common', description='Common', probability=0.9)
+        self.legendary = Rarity.objects.create(title='Legendary', description='Legendary', probability=0.1)
+        self.card_set = CardSet.objects.create(title='Base Set', description='Base set')
+        self.other_set = CardSet.objects.create(title='Other Set', description='Other set')
+        self.common_card = Card.objects.create(title='Common Card', description='Common',
+                                               rarity=self.common, card_set=self.card_set)
+        self.legendary_card = Card.objects.create(title='Legendary Card', description='Legendary',
+                                                  rarity=self.legendary, card_set=self.card_set)
+        self.other_card = Card.objects.create(title='Other Card', description='Other',
+                                              rarity=self.common, card_set=self.other_set)
+
+    def test_draws_only_from_requested_set(self):
+        cards = draw_cards(self.card_set.id, k=50)
+        self.assertTrue(all(card.card_set_id == self.card_set.id for card in cards))
+
+    def test_draws_need_no_queries_once_built(self):
+        draw_cards(self.card_set.id)
+        with self.assertNumQueries(0):
+            draw_cards(self.card_set.id, k=5)
+
+    def test_sampler_rebuilt_when_catalog_changes(self):
+        self.assertEqual(len(get_sampler(self.other_set.id)), 1)
+        Card.objects.create(title='New Card', description='New', rarity=self.legendary, card_set=self.other_set)
+        self.assertEqual(len(get_sampler(self.other_set.id)), 2)
+
+    def test_empty_set_raises(self):
+        empty_set = CardSet.objects.create(title='Empty Set', description='Empty')
+        with self.assertRaises(ValueError):
+            draw_cards(empty_set.id)
+
+
+class OpenPackTest(TestCase):
+    """Backend tests for batched pack opening"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='packuser', password='securepassword123')
+        self.rarity = Rarity.objects.create(title='Common', description='Common', probability=1)
+        self.card_set = CardSet.objects.create(title='Base Set', description='Base set')
+        self.other_set = CardSet.objects.create(title='Other Set', description='Other set')
+        self.card = Card.objects.create(title='Only Card', description='Only card',
+                                        rarity=self.rarity, card_set=self.card_set)
+        Card.objects.create(title='Other Card', description='Other card',
+                            rarity=self.rarity, card_set=self.other_set)
+
+    def test_pack_size_is_independent_of_set(self):
+        cards = open_pack(self.user, self.card_set, num_cards=3)
+        self.assertEqual(len(cards), 3)
+        self.assertTrue(all(card == self.card for card, _ in cards))
+
+    def test_duplicates_are_aggregated(self):
+        cards = open_pack(self.user, self.card_set, num_cards=5)
+        self.assertTrue(all(is_new for _, is_new in cards))
+        collection_card = CollectionCard.objects.get(collection__user=self.user)
+        self.assertEqual(collection_card.quantity, 5)
+
+        cards = open_pack(self.user, self.card_set, num_cards=2)
+        self.assertFalse(any(is_new for _, is_new in cards))
+        collection_card.refresh_from_db()
+        self.assertEqual(collection_card.quantity, 7)
+
+
+class PackStatusTest(TestCase):
+    """Backend tests for pack credit accounting"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='creditsuser', password='securepassword123')
+        self.status = PackStatus.objects.get(user=self.user)
+
+    def test_reading_regeneration_does_not_write(self):
+        PackStatus.objects.filter(pk=self.status.pk).update(
+            packs_available=0, last_opened=timezone.now() - timedelta(hours=9))
+        self.status.refresh_from_db()
+        self.assertEqual(self.status.current_packs, 2)
+        self.status.refresh_from_db()
+        self.assertEqual(self.status.packs_available, 0)
+
+    def test_consume_pack_until_empty(self):
+        self.assertEqual(self.status.consume_pack(), 1)
+        self.assertEqual(self.status.consume_pack(), 0)
+        self.assertIsNone(self.status.consume_pack())
+
+    def test_stale_copies_cannot_double_spend(self):
+        PackStatus.objects.filter(pk=self.status.pk).update(packs_available=1)
+        first = PackStatus.objects.get(pk=self.status.pk)
+        second = PackStatus.objects.get(pk=self.status.pk)
+        self.assertEqual(first.consume_pack(), 0)
+        self.assertIsNone(second.consume_pack())
+        self.assertEqual(PackStatus.objects.get(pk=self.status.pk).packs_available, 0)
+
+    def test_open_pack_view_spends_one_pack(self):
+        rarity = Rarity.objects.create(title='Common', description='Common', probability=1)
+        card_set = CardSet.objects.create(title='Base Set', description='Base set')
+        Card.objects.create(title='Only Card', description='Only card', rarity=rarity,
+                            card_set=card_set, image='card_images/only.png')
+        self.client.force_login(self.user)
+
+        response = self.client.post(reverse('open_pack', args=[card_set.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['cards_with_status']), 5)
+        self.assertEqual(PackStatus.objects.get(user=self.user).packs_available, 1)
+
+    def test_viewing_the_pack_page_does_not_pin(self):
+        card_set = CardSet.objects.create(title='Base Set', description='Base set', image='card_sets/base.png')
+        self.client.force_login(self.user)
+        with mock.patch('WebProjecte.middleware.replica_configured', return_value=True):
+            response = self.client.get(reverse('open_pack', args=[card_set.id]))
+        self.assertEqual(response.context['packs_available'], 2)
+        self.assertNotIn('primary_pin', response.cookies)
+
+
+class UserCardsApiTest(TestCase):
+    """Backend tests for the collection API projection and pagination"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='apiuser', password='securepassword123')
+        self.collection = Collection.objects.get(user=self.user)
+        self.common = Rarity.objects.create(title='Common', description='Common', probability=0.9)
+        self.epic = Rarity.objects.create(title='Epic', description='Epic', probability=0.1)
+        self.card_set = CardSet.objects.create(title='Base Set', description='Base set')
+        for i in range(5):
+            card = Card.objects.create(title=f'Card {i}', description='Card', image=f'card_images/{i}.png',
+                                       rarity=self.epic if i % 2 else self.common, card_set=self.card_set)
+            CollectionCard.objects.create(card=card, collection=self.collection, quantity=i + 1)
+        self.client.force_login(self.user)
+
+    def test_constant_number_of_queries(self):
+        # Session, user and the projection itself
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('user_cards_api'))
+        data = response.json()
+        self.assertEqual(len(data), 5)
+        self.assertEqual(data[0]['name'], 'Card 0')
+        self.assertEqual(data[0]['quantity'], 1)
+        self.assertEqual(data[0]['type'], 'Base Set')
+
+    def test_filters_and_keyset_pagination(self):
+        response = self.client.get(reverse('user_cards_api'), {'rarity': self.epic.id, 'limit': 1})
+        self.assertEqual([card['name'] for card in response.json()], ['Card 1'])
+        self.assertIn('rel="next"', response['Link'])
+
+        next_url = response['Link'][1:response['Link'].index('>')]
+        response = self.client.get(next_url)
+        self.assertEqual([card['name'] for card in response.json()], ['Card 3'])
+        self.assertFalse(response.has_header('Link'))
+
+    def test_invalid_parameters(self):
+        response = self.client.get(reverse('user_cards_api'), {'set': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ApiCardsCacheTest(TestCase):
+    """Backend tests for the versioned catalog endpoint"""
+
+    def setUp(self):
+        self.rarity = Rarity.objects.create(title='Common', description='Common', probability=1)
+        self.card_set = CardSet.objects.create(title='Base Set', description='Base set')
+        Card.objects.create(title='Cached Card', description='Cached', image='card_images/cached.png',
+                            rarity=self.rarity, card_set=self.card_set)
+
+    def test_cached_until_catalog_changes(self):
+        response = self.client.get(reverse('api_cards'))
+        self.assertEqual(response.json()[0]['name'], 'Cached Card')
+        self.assertIn('max-age', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('api_cards'))
+
+        Card.objects.create(title='New Card', description='New', image='card_images/new.png',
+                            rarity=self.rarity, card_set=self.card_set)
+        self.assertEqual(len(self.client.get(reverse('api_cards')).json()), 2)
+
+    def test_not_modified_on_matching_etag(self):
+        etag = self.client.get(reverse('api_cards'))['ETag']
+        response = self.client.get(reverse('api_cards'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        self.rarity.save()
+        response = self.client.get(reverse('api_cards'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_version_moves_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Card.objects.create(title='New Card', description='New', image='card_images/new.png',
+                                rarity=self.rarity, card_set=self.card_set)
+            # What a concurrent request could cache from the rows before this commit
+            stale_version = get_catalog_version()
+            cache.set(catalog_key('api_cards', stale_version), b'[]')
+        self.assertNotEqual(get_catalog_version(), stale_version)
+        self.assertEqual(len(json.loads(get_api_cards_json())), 2)
+
+
+class StreamingExportTest(TestCase):
+    """Backend tests for streamed JSON responses"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='streamuser', password='securepassword123')
+        rarity = Rarity.objects.create(title='Common', description='Common', probability=1)
+        card_set = CardSet.objects.create(title='Base Set', description='Base set')
+        collection = Collection.objects.get(user=self.user)
+        for i in range(3):
+            card = Card.objects.create(title=f'Card {i}', description='Card', image=f'card_images/{i}.png',
+                                       rarity=rarity, card_set=card_set)
+            CollectionCard.objects.create(card=card, collection=collection, quantity=1)
+        self.client.force_login(self.user)
+
+    def streamed_json(self, response):
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_iter_json_array_batches(self):
+        self.assertEqual(''.join(iter_json_array(range(5), batch_size=2)), '[0,1,2,3,4]')
+        self.assertEqual(''.join(iter_json_array([])), '[]')
+
+    async def astreamed_json(self, response):
+        # Async views stream from async iterators, which ASGI sends chunk by chunk
+        self.assertTrue(response.is_async)
+        return json.loads(b''.join([chunk async for chunk in response.streaming_content]))
+
+    async def test_streamed_endpoints(self):
+        await self.async_client.aforce_login(self.user)
+        cards = await self.astreamed_json(await self.async_client.get(reverse('api_cards'), {'stream': 1}))
+        self.assertEqual([card['name'] for card in cards], ['Card 0', 'Card 1', 'Card 2'])
+
+        first_id = (await Card.objects.order_by('id').afirst()).id
+        response = await self.async_client.get(reverse('user_cards_api'), {'stream': 1, 'after': first_id})
+        cards = await self.astreamed_json(response)
+        self.assertEqual([card['name'] for card in cards], ['Card 1', 'Card 2'])
+
+    def test_collection_export(self):
+        response = self.client.get(reverse('user_cards_export'))
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertEqual(len(self.streamed_json(response)), 3)
+
+    def test_wsgi_requests_stream_synchronously(self):
+        response = self.client.get(reverse('user_cards_api'), {'stream': 1})
+        self.assertFalse(response.is_async)
+        self.assertEqual(len(self.streamed_json(response)), 3)
+
+
+class CollectionOwnershipTest(TestCase):
+    """Backend tests for the cached ownership bitmap behind the collection page"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='owneruser', password='securepassword123')
+        rarity = Rarity.objects.create(title='Common', description='Common', probability=1)
+        self.card_set = CardSet.objects.create(title='Base Set', description='Base set')
+        self.cards = [
+            Card.objects.create(title=f'Card {i}', description='Card', image=f'card_images/{i}.png',
+                                rarity=rarity, card_set=self.card_set)
+            for i in range(3)
+        ]
+        self.collection = Collection.objects.get(user=self.user)
+        CollectionCard.objects.create(card=self.cards[0], collection=self.collection, quantity=1)
+        self.client.force_login(self.user)
+
+    def owned_names(self):
+        response = self.client.get(reverse('collection'))
+        return [card['name'] for card in response.context['cards'] if card['has']]
+
+    def test_bitmap_membership(self):
+        bitmap = OwnershipBitmap.from_ids([0, 9, 64])
+        self.assertIn(9, bitmap)
+        self.assertNotIn(10, bitmap)
+        self.assertNotIn(1000, bitmap)
+        self.assertEqual(len(bitmap), 3)
+
+    def test_collection_page_tracks_ownership(self):
+        self.assertEqual(self.owned_names(), ['Card 0'])
+
+        CollectionCard.objects.create(card=self.cards[2], collection=self.collection, quantity=1)
+        self.assertEqual(self.owned_names(), ['Card 0', 'Card 2'])
+
+        CollectionCard.objects.filter(card=self.cards[0]).get().delete()
+        self.assertEqual(self.owned_names(), ['Card 2'])
+
+    def test_opening_a_pack_updates_ownership(self):
+        self.owned_names()
+        open_pack(self.user, self.card_set, num_cards=30)
+        owned = get_ownership(self.user.id)
+        for card_id in CollectionCard.objects.values_list('card_id', flat=True):
+            self.assertIn(card_id, owned)
+
+
+class CollectionBrowserTest(TestCase):
+    """Backend tests for collection filters and keyset pagination"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='browseruser', password='securepassword123')
+        self.common = Rarity.objects.create(title='Common', description='Common', probability=0.9)
+        self.epic = Rarity.objects.create(title='Epic', description='Epic', probability=0.1)
+        self.card_set = CardSet.objects.create(title='Base Set', description='Base set')
+        self.other_set = CardSet.objects.create(title='Other Set', description='Other set')
+        self.cards = [
+            Card.objects.create(title=title, description='Card', image=f'card_images/{i}.png',
+                                rarity=rarity, card_set=card_set)
+            for i, (title, rarity, card_set) in enumerate([
+                ('Teacher Latra', self.epic, self.card_set),
+                ('Student Latra', self.common, self.card_set),
+                ('Teacher David', self.common, self.other_set),
+                ('Student David', self.epic, self.other_set),
+            ])
+        ]
+        CollectionCard.objects.create(card=self.cards[1], collection=Collection.objects.get(user=self.user),
+                                      quantity=1)
+        self.client.force_login(self.user)
+
+    def names(self, **params):
+        response = self.client.get(reverse('collection'), params)
+        self.assertEqual(response.status_code, 200)
+        return [card['name'] for card in response.context['cards']], response.context['next_url']
+
+    def test_filters(self):
+        self.assertEqual(self.names(set=self.card_set.id)[0], ['Teacher Latra', 'Student Latra'])
+        self.assertEqual(self.names(rarity=self.epic.id)[0], ['Teacher Latra', 'Student David'])
+        self.assertEqual(self.names(q='teacher')[0], ['Teacher Latra', 'Teacher David'])
+        self.assertEqual(self.names(show='owned')[0], ['Student Latra'])
+        self.assertEqual(len(self.names(show='missing')[0]), 3)
+
+    def test_keyset_pagination(self):
+        names, next_url = self.names(limit=3)
+        self.assertEqual(len(names), 3)
+        response = self.client.get(reverse('collection') + next_url)
+        self.assertEqual([card['name'] for card in response.context['cards']], ['Student David'])
+        self.assertIsNone(response.context['next_url'])
+        # The first page keeps the filters and page size, only the position is dropped
+        self.assertEqual(response.context['first_url'], '?limit=3')
+
+    def test_warm_page_runs_no_catalog_query(self):
+        self.names(show='missing')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.names(show='missing', q='student')[0], ['Student David'])
+        self.assertFalse([q for q in ctx.captured_queries if 'webprojecte_card' in q['sql'].lower()])
+
+    def test_filtered_pages_walk_their_own_ids(self):
+        ids = [card.id for card in self.cards]
+        self.assertEqual(get_card_ids(self.card_set.id), ids[:2])
+        self.assertEqual(get_card_ids(None, self.epic.id), [ids[0], ids[3]])
+        self.assertEqual(get_card_ids(self.other_set.id, self.common.id), [ids[2]])
+        self.assertEqual(get_card_ids(self.card_set.id, 0), [])
+        self.assertEqual(get_card_ids_by_title('student'), [ids[1], ids[3]])
+        self.assertEqual(get_card_ids_by_title('x'), [])
+
+    def test_fragments_use_the_page_snapshot(self):
+        # A catalog rebuilt between the filter and the render must not drop or break cards
+        with mock.patch('WebProjecte.services.card_fragments.get_cards', return_value={}):
+            self.assertEqual(len(self.names()[0]), 4)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class AvatarJobTest(TestCase):
+    """Backend tests for the background avatar queue"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='avataruser', password='securepassword123')
+        self.job = AvatarJob.objects.get(user=self.user)
+
+    def test_registration_only_enqueues(self):
+        self.assertEqual(self.job.status, AvatarJob.PENDING)
+        self.assertFalse(Profile.objects.get(user=self.user).profile_image)
+
+    def test_worker_saves_avatar(self):
+        self.assertEqual(run_pending(), 1)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, AvatarJob.DONE)
+        self.assertTrue(Profile.objects.get(user=self.user).profile_image)
+        self.assertEqual(run_pending(), 0)
+
+    def test_worker_retries_then_gives_up(self):
+        error = OSError('Disk full')
+        with mock.patch('WebProjecte.services.avatar_jobs.fetch_avatar', side_effect=error), \
+                self.assertLogs('WebProjecte.services.avatar_jobs', 'ERROR'):
+            run_pending()
+            self.job.refresh_from_db()
+            self.assertEqual(self.job.status, AvatarJob.PENDING)
+            self.assertGreater(self.job.run_after, timezone.now())
+
+            for _ in range(MAX_ATTEMPTS - 1):
+                AvatarJob.objects.filter(pk=self.job.pk).update(run_after=timezone.now())
+                run_pending()
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, AvatarJob.FAILED)
+        self.assertEqual(self.job.attempts, MAX_ATTEMPTS)
+        # The last failure falls back to the avatar seeded by the username
+        with Profile.objects.get(user=self.user).profile_image.open('rb') as f:
+            self.assertEqual(f.read(), render_avatar(self.user.username))
+
+    def test_any_error_is_recorded(self):
+        with mock.patch('WebProjecte.services.avatar_jobs.fetch_avatar', side_effect=ValueError), \
+                self.assertLogs('WebProjecte.services.avatar_jobs', 'ERROR'):
+            run_pending()
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, AvatarJob.PENDING)
+        self.assertEqual(self.job.attempts, 1)
+        self.assertEqual(self.job.last_error, 'ValueError')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class AvatarRendererTest(TestCase):
+    """Backend tests for the local avatar generator"""
+
+    def test_same_seed_same_png(self):
+        for style in AVATAR_STYLES:
+            first = render_avatar('seed123', style)
+            self.assertEqual(first, render_avatar('seed123', style))
+            self.assertNotEqual(first, render_avatar('seed456', style))
+            self.assertEqual(Image.open(BytesIO(first)).size, (256, 256))
+
+    def test_memory_cache_renders_once(self):
+        avatar_png.cache_clear()
+        with mock.patch('WebProjecte.services.avatar_renderer.render_avatar',
+                        wraps=render_avatar) as render:
+            first = avatar_png('cached', 'identicon')
+            second = avatar_png('cached', 'identicon')
+        self.assertEqual(first, second)
+        self.assertEqual(render.call_count, 1)
+
+    def test_preview_endpoint(self):
+        url = reverse('avatar_preview')
+        self.assertEqual(self.client.get(url, {'seed': 'abc'}).status_code, 302)
+
+        self.client.force_login(User.objects.create_user(username='previewuser', password='securepassword123'))
+        response = self.client.get(url, {'seed': 'abc', 'style': 'robot'})
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.client.get(url, {'seed': 'abc', 'style': 'x'}).status_code, 400)
+
+    @override_settings(AVATAR_PREVIEW_RATE_LIMIT=2)
+    def test_preview_rate_limit(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user(username='previewuser', password='securepassword123'))
+        statuses = [self.client.get(reverse('avatar_preview'), {'seed': f'seed{i}'}).status_code for i in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_profile_random_avatar_is_rendered_locally(self):
+        user = User.objects.create_user(username='seeduser', password='securepassword123')
+        self.client.force_login(user)
+        self.client.post(reverse('profile'), {'username': 'seeduser', 'avatar_seed': 'abc',
+                                              'avatar_style': 'identicon'})
+        profile = Profile.objects.get(user=user)
+        with profile.profile_image.open('rb') as f:
+            self.assertEqual(f.read(), render_avatar('abc', 'identicon'))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ThumbnailTest(TestCase):
+    """Backend tests for responsive image derivatives"""
+
+    def setUp(self):
+        cache.clear()
+        self.rarity = Rarity.objects.create(title='Common', description='Common', probability=1)
+
+    def upload(self, name, size=(800, 1200)):
+        buffer = BytesIO()
+        Image.new('RGB', size, color='red').save(buffer, format='PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_derivatives_built_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            card_set = CardSet.objects.create(title='Base Set', description='Base set', image=self.upload('set.png'))
+            card = Card.objects.create(title='Thumb Card', description='Card', rarity=self.rarity,
+                                       card_set=card_set, image=self.upload('card.png'))
+            # Nothing is encoded inside the saving transaction
+            self.assertFalse(card.image.storage.exists(thumbnail_name(card.image.name, 640)))
+
+        for width in THUMBNAIL_WIDTHS:
+            name = thumbnail_name(card.image.name, width)
+            self.assertTrue(card.image.storage.exists(name))
+            with card.image.storage.open(name) as f:
+                self.assertEqual(Image.open(f).size[0], width)
+        self.assertIn('640w', card.image_srcset)
+        self.assertIn('160w', card_set.image_srcset)
+
+    def test_small_images_are_not_upscaled(self):
+        card_set = CardSet.objects.create(title='Base Set', description='Base set')
+        with self.captureOnCommitCallbacks(execute=True):
+            card = Card.objects.create(title='Small Card', description='Card', rarity=self.rarity, card_set=card_set,
+                                       image=self.upload('small.png', size=(200, 300)))
+        with card.image.storage.open(thumbnail_name(card.image.name, 640)) as f:
+            self.assertEqual(Image.open(f).size, (200, 300))
+        # Candidates carry their real width, read back from the files once the cache is gone
+        for _ in range(2):
+            self.assertEqual([candidate.split()[1] for candidate in card.image_srcset.split(', ')], ['160w', '200w'])
+            cache.clear()
+
+    def test_extension_is_part_of_the_name(self):
+        self.assertNotEqual(thumbnail_name('card_images/foo.png', 320), thumbnail_name('card_images/foo.jpg', 320))
+
+    def test_missing_file_has_no_srcset(self):
+        card_set = CardSet.objects.create(title='Base Set', description='Base set')
+        card = Card.objects.create(title='Ghost Card', description='Card', rarity=self.rarity, card_set=card_set,
+                                   image='card_images/missing.png')
+        self.assertEqual(card.image_srcset, '')
+        # The miss is remembered too
+        with mock.patch.object(card.image.storage, 'exists') as exists:
+            self.assertEqual(card.image_srcset, '')
+        exists.assert_not_called()
+
+
+class FileServingTest(TestCase):
+    """Backend tests for media serving with ranges, conditional GET and sendfile"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        with open(os.path.join(self.media_root, 'data.txt'), 'wb') as f:
+            f.write(b'0123456789')
+        with open(os.path.join(self.media_root, 'data.txt.gz'), 'wb') as f:
+            f.write(gzip.compress(b'0123456789'))
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.url = reverse('media', args=['data.txt'])
+
+    def test_full_and_conditional_get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        # Files replaced under the same name must not be served stale from caches
+        self.assertIn('no-cache', response['Cache-Control'])
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_precompressed_variant(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b'0123456789')
+        self.assertNotEqual(response['ETag'], self.client.get(self.url)['ETag'])
+
+    def test_accept_encoding_qualities(self):
+        for header in ('gzip;q=0', 'br, gzip; q=0', '*;q=0', 'gzipped', 'identity'):
+            self.assertNotIn('Content-Encoding', self.client.get(self.url, HTTP_ACCEPT_ENCODING=header), header)
+        for header in ('GZIP', 'br;q=1, *;q=0.5', 'deflate, gzip;q=0.8'):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING=header)
+            self.assertEqual(response['Content-Encoding'], 'gzip', header)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+        self.assertEqual(b''.join(response.streaming_content), b'234')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=20-').status_code, 416)
+
+    async def test_asgi_streams_blocks(self):
+        # Sync iterators would be read whole into memory by the ASGI handler
+        async def body(response):
+            self.assertTrue(response.is_async)
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(await body(response), b'0123456789')
+        response = await self.async_client.get(self.url, ACCEPT_ENCODING='gzip')
+        self.assertEqual(gzip.decompress(await body(response)), b'0123456789')
+        response = await self.async_client.get(self.url, RANGE='bytes=2-4')
+        self.assertEqual(await body(response), b'234')
+
+    def test_sendfile_handoff(self):
+        with self.settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/data.txt')
+        self.assertEqual(response.content, b'')
+
+    def test_path_traversal_is_rejected(self):
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class UserCardUpsertTest(TestCase):
+    """Backend tests for single-card upserts and the deferred file sweeper"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='cardmaker', password='securepassword123')
+        self.rarity = Rarity.objects.create(title='Common', description='Common', probability=1)
+        self.client.force_login(self.user)
+
+    def submit(self, title):
+        buffer = BytesIO()
+        Image.new('RGB', (50, 50), color='green').save(buffer, format='PNG')
+        image = SimpleUploadedFile(f'{title}.png', buffer.getvalue(), content_type='image/png')
+        return self.client.post(reverse('add_card'), {
+            'title': title, 'description': title, 'image': image, 'rarity': self.rarity.id,
+        })
+
+    def test_replacing_card_defers_file_cleanup(self):
+        self.assertEqual(self.submit('first').status_code, 302)
+        first = UserCard.objects.get(user=self.user)
+        self.assertEqual(self.submit('second').status_code, 302)
+
+        card = UserCard.objects.get(user=self.user)
+        self.assertEqual(card.title, 'second')
+        self.assertEqual(card.pk, first.pk)
+        # The old file survives until the sweeper runs
+        self.assertTrue(first.image.storage.exists(first.image.name))
+        self.assertEqual(PendingFileDeletion.objects.get().name, first.image.name)
+
+        self.assertEqual(sweep(), 1)
+        self.assertFalse(first.image.storage.exists(first.image.name))
+        self.assertTrue(card.image.storage.exists(card.image.name))
+        self.assertFalse(PendingFileDeletion.objects.exists())
+
+    def test_sweeper_keeps_files_still_in_use(self):
+        self.submit('kept')
+        card = UserCard.objects.get(user=self.user)
+        queue_file_deletion([card.image.name])
+        sweep()
+        self.assertTrue(card.image.storage.exists(card.image.name))
+
+    def test_one_card_per_user_constraint(self):
+        self.submit('only')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            UserCard.objects.create(user=self.user, title='dup', description='dup', image='x.png',
+                                    rarity=self.rarity)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ProfileChangeTrackingTest(TestCase):
+    """Backend tests for query-free profile image change tracking"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='trackuser', password='securepassword123')
+
+    def test_login_does_not_touch_profile(self):
+        # Session lookups and the last_login update only
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.login(username='trackuser', password='securepassword123')
+        self.assertFalse([q for q in ctx.captured_queries if 'webprojecte_profile' in q['sql'].lower()])
+
+    def test_profile_save_needs_no_lookup(self):
+        profile = Profile.objects.get(user=self.user)
+        with self.assertNumQueries(1):
+            profile.save()
+
+    def test_replaced_image_is_deleted(self):
+        profile = Profile.objects.get(user=self.user)
+        profile.profile_image.save('old.png', ContentFile(b'old'))
+        old_name = profile.profile_image.name
+
+        profile = Profile.objects.get(user=self.user)
+        profile.profile_image.save('new.png', ContentFile(b'new'))
+        self.assertFalse(profile.profile_image.storage.exists(old_name))
+        self.assertTrue(profile.profile_image.storage.exists(profile.profile_image.name))
+
+    def test_user_save_persists_changed_profile(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.profile.profile_image = 'profile_pics/changed.png'
+        user.save()
+        self.assertEqual(Profile.objects.get(user=self.user).profile_image.name, 'profile_pics/changed.png')
+
+
+class UserSearchTest(TestCase):
+    """Backend tests for the indexed friend search"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='searcher', password='securepassword123')
+        self.friend = User.objects.create_user(username='AliceFriend', password='securepassword123')
+        self.sent = User.objects.create_user(username='alicesent', password='securepassword123')
+        self.received = User.objects.create_user(username='alicereceived', password='securepassword123')
+        self.stranger = User.objects.create_user(username='alicestranger', password='securepassword123')
+        User.objects.create_user(username='bob', password='securepassword123')
+        self.user.profile.friends.add(self.friend.profile)
+        FriendRequest.objects.create(from_user=self.user, to_user=self.sent)
+        self.incoming = FriendRequest.objects.create(from_user=self.received, to_user=self.user)
+
+    def test_search_name_follows_username(self):
+        self.assertEqual(Profile.objects.get(user=self.friend).search_name, 'alicefriend')
+        self.friend.username = 'Carol'
+        self.friend.save()
+        self.assertEqual(Profile.objects.get(user=self.friend).search_name, 'carol')
+
+    def test_prefix_match_is_case_insensitive(self):
+        rows, _ = search_users(self.user, 'ALICE')
+        self.assertEqual([row['user__username'] for row in rows],
+                         ['AliceFriend', 'alicereceived', 'alicesent', 'alicestranger'])
+        self.assertEqual(search_users(self.user, 'searcher')[0], [])
+
+    def test_status_annotated_in_one_query(self):
+        self.friend.profile.friends.add(self.stranger.profile)
+        search_users(self.user, 'alice')
+        # Friendship comes from the cached graph once it is warm
+        with self.assertNumQueries(1):
+            rows, _ = search_users(self.user, 'alice')
+        status = {row['user_id']: row for row in rows}
+        self.assertTrue(status[self.friend.id]['is_friend'])
+        self.assertEqual(status[self.stranger.id]['mutual'], 1)
+        self.assertTrue(status[self.sent.id]['request_sent'])
+        self.assertEqual(status[self.received.id]['received_request_id'], self.incoming.id)
+        stranger = status[self.stranger.id]
+        self.assertFalse(stranger['is_friend'] or stranger['request_sent'] or stranger['received_request_id'])
+
+    def test_keyset_pages(self):
+        first, after = search_users(self.user, 'alice', limit=3)
+        second, last = search_users(self.user, 'alice', after=after, limit=3)
+        self.assertEqual(len(first), 3)
+        self.assertEqual([row['user__username'] for row in second], ['alicestranger'])
+        self.assertIsNone(last)
+
+    def test_friends_page_paginates(self):
+        self.client.login(username='searcher', password='securepassword123')
+        response = self.client.get(reverse('friends_list'), {'q': 'alice'})
+        self.assertContains(response, 'alicestranger')
+        self.assertContains(response, 'Request sent')
+        self.assertNotContains(response, 'bob')
+        self.assertIsNone(response.context['next_url'])
+        self.assertEqual(self.client.get(reverse('friends_list'), {'q': 'a', 'after_id': 'x'}).status_code, 302)
+
+    def test_no_request_to_a_friend(self):
+        self.client.login(username='searcher', password='securepassword123')
+        self.client.get(reverse('send_friend_request', args=[self.friend.id]))
+        self.assertFalse(FriendRequest.objects.filter(from_user=self.user, to_user=self.friend).exists())
+        self.client.get(reverse('send_friend_request', args=[self.stranger.id]))
+        self.assertTrue(FriendRequest.objects.filter(from_user=self.user, to_user=self.stranger).exists())
+
+
+class FriendGraphTest(TestCase):
+    """Backend tests for the cached friend adjacency"""
+
+    def setUp(self):
+        # Ids are reused after each test's rollback, cached adjacency is not
+        cache.clear()
+        self.ana, self.ben, self.cat, self.dan, self.eve = [
+            User.objects.create_user(username=name, password='securepassword123')
+            for name in ('ana', 'ben', 'cat', 'dan', 'eve')
+        ]
+        # ana - ben, ana - cat, ben - dan, cat - dan, cat - eve
+        self.ana.profile.friends.add(self.ben.profile, self.cat.profile)
+        self.dan.profile.friends.add(self.ben.profile, self.cat.profile)
+        self.eve.profile.friends.add(self.cat.profile)
+
+    def test_queries_hit_the_cache(self):
+        get_friend_ids(self.ana.id)
+        with self.assertNumQueries(0):
+            self.assertTrue(are_friends(self.ana.id, self.ben.id))
+            self.assertFalse(are_friends(self.ana.id, self.dan.id))
+            self.assertEqual(friend_count(self.ana.id), 2)
+
+    def test_suggestions(self):
+        self.assertEqual(suggest_friends(self.ana.id), [(self.dan.id, 2), (self.eve.id, 1)])
+
+    def test_add_remove_and_clear_invalidate(self):
+        self.assertFalse(are_friends(self.eve.id, self.ana.id))
+        self.ana.profile.friends.add(self.eve.profile)
+        self.assertTrue(are_friends(self.eve.id, self.ana.id))
+        self.ana.profile.friends.remove(self.ben.profile)
+        self.assertFalse(are_friends(self.ben.id, self.ana.id))
+        self.cat.profile.friends.clear()
+        self.assertEqual(get_friend_ids(self.eve.id), {self.ana.id})
+        self.assertEqual(friend_count(self.cat.id), 0)
+
+    def test_deleted_user_leaves_friend_lists(self):
+        self.assertEqual(friend_count(self.dan.id), 2)
+        self.ben.delete()
+        self.assertEqual(get_friend_ids(self.dan.id), {self.cat.id})
+
+    def test_friends_page(self):
+        FriendRequest.objects.create(from_user=self.eve, to_user=self.ana)
+        self.client.login(username='ana', password='securepassword123')
+        response = self.client.get(reverse('friends_list'))
+        self.assertEqual([friend['username'] for friend in response.context['friends']], ['ben', 'cat'])
+        self.assertContains(response, '2 mutual friends')
+        self.assertEqual(list(response.context['received_requests'])[0]['from_user__username'], 'eve')
+        self.assertContains(self.client.get(reverse('profile')), '2 friends')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class AccountDeletionTest(TestCase):
+    """Backend tests for the batched account deletion pipeline"""
+
+    def setUp(self):
+        cache.clear()
+        rarity = Rarity.objects.create(title='Common', probability=1.0)
+        card_set = CardSet.objects.create(title='Base')
+        self.card = Card.objects.create(title='Card', rarity=rarity, card_set=card_set)
+        self.keeper = User.objects.create_user(username='keeper', password='securepassword123')
+        self.users = [User.objects.create_user(username=f'doomed{i}', password='securepassword123') for i in range(5)]
+        for user in self.users:
+            open_pack(user, card_set, 1)
+            UserCard.objects.create(user=user, title='Mine', rarity=rarity, image=f'user_cards/{user.username}.png')
+            FriendRequest.objects.create(from_user=user, to_user=self.keeper)
+            user.profile.friends.add(self.keeper.profile)
+        Profile.objects.filter(user=self.users[0]).update(profile_image='profile_pics/doomed0.png')
+
+    def test_batches_delete_everything_but_the_kept_users(self):
+        batches = []
+        deleted = delete_users(User.objects.filter(username__startswith='doomed'), batch_size=2,
+                               progress=lambda done, total: batches.append((done, total)))
+        self.assertEqual(deleted, 5)
+        self.assertEqual(batches, [(2, 5), (4, 5), (5, 5)])
+        self.assertEqual(list(User.objects.values_list('username', flat=True)), ['keeper'])
+        for model in (Profile, Collection, PackStatus, AvatarJob):
+            self.assertEqual(model.objects.exclude(user=self.keeper).count(), 0)
+        self.assertFalse(UserCard.objects.exists() or FriendRequest.objects.exists() or CollectionCard.objects.exists())
+        self.assertEqual(Profile.friends.through.objects.count(), 0)
+        self.assertEqual(friend_count(self.keeper.id), 0)
+
+    def test_files_are_queued_for_the_sweeper(self):
+        delete_user_batch([self.users[0].pk])
+        self.assertEqual(set(PendingFileDeletion.objects.values_list('name', flat=True)),
+                         {'profile_pics/doomed0.png', 'user_cards/doomed0.png'})
+
+    def test_profile_view_deletes_the_account(self):
+        self.client.login(username='doomed1', password='securepassword123')
+        response = self.client.post(reverse('profile'), {'action': 'delete_account'})
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        self.assertFalse(User.objects.filter(username='doomed1').exists())
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+
+class CatalogImportTest(TestCase):
+    """Backend tests for the import_catalog command"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        Rarity.objects.create(title='Common', description='Easy', probability=0.9)
+        self.base = CardSet.objects.create(title='Base', description='First')
+        Card.objects.create(title='Old', description='Same', rarity=Rarity.objects.get(), card_set=self.base)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def files(self):
+        rarities = self.write('rarities.csv', 'title,description,probability\nCommon,Easy,0.8\nRare,Hard,0.2\n')
+        sets = self.write('sets.json', json.dumps([{'title': 'Expansion', 'description': 'Second'}]))
+        cards = self.write('cards.jsonl', '\n'.join(json.dumps(card) for card in [
+            {'title': 'Old', 'description': 'Same', 'set': 'Base', 'rarity': 'Common'},
+            {'title': 'Dragon', 'description': 'New', 'set': 'Expansion', 'rarity': 'Rare'},
+            {'title': 'Old', 'description': 'Other set', 'set': 'Expansion', 'rarity': 'Common'},
+        ]))
+        return {'rarities': rarities, 'sets': sets, 'cards': cards}
+
+    def test_dry_run_prints_diff_and_writes_nothing(self):
+        out = StringIO()
+        call_command('import_catalog', dry_run=True, stdout=out, **self.files())
+        output = out.getvalue()
+        self.assertIn('~ rarity Common: probability', output)
+        self.assertIn('+ card Expansion / Dragon', output)
+        self.assertNotIn('Base / Old', output)
+        self.assertEqual(Card.objects.count(), 1)
+        self.assertEqual(Rarity.objects.get().probability, 0.9)
+
+    def test_import_upserts_in_batches(self):
+        version = get_catalog_version()
+        call_command('import_catalog', batch_size=2, stdout=StringIO(), **self.files())
+        self.assertEqual(Rarity.objects.get(title='Common').probability, 0.8)
+        self.assertEqual(Card.objects.count(), 3)
+        self.assertEqual(Card.objects.get(title='Dragon').rarity.title, 'Rare')
+        self.assertEqual(Card.objects.get(title='Old', card_set=self.base).description, 'Same')
+        self.assertNotEqual(get_catalog_version(), version)
+
+        # A second run finds nothing to write
+        out = StringIO()
+        call_command('import_catalog', stdout=out, **self.files())
+        self.assertIn('cards: 0 created, 0 updated, 3 unchanged', out.getvalue())
+
+    def test_unknown_reference_rolls_back(self):
+        cards = self.write('cards.csv', 'title,description,set,rarity\nA,,Base,Common\nB,,Nowhere,Common\n')
+        with self.assertRaisesMessage(CommandError, "unknown set 'Nowhere'"):
+            call_command('import_catalog', cards=cards, batch_size=1, stdout=StringIO())
+        self.assertFalse(Card.objects.filter(title='A').exists())
+
+
+class ClearCardsTest(TestCase):
+    """Backend tests for the batched clear_cards reset"""
+
+    def setUp(self):
+        cache.clear()
+        self.common = Rarity.objects.create(title='Common', description='Common', probability=0.9)
+        self.epic = Rarity.objects.create(title='Epic', description='Epic', probability=0.1)
+        self.base = CardSet.objects.create(title='Base Set', description='Base set')
+        self.other = CardSet.objects.create(title='Other Set', description='Other set')
+        self.base_cards = [Card.objects.create(title=f'Base {i}', description='Card', rarity=self.common,
+                                               card_set=self.base) for i in range(5)]
+        self.other_card = Card.objects.create(title='Other', description='Card', rarity=self.common,
+                                              card_set=self.other)
+        self.user = User.objects.create_user(username='collector', password='securepassword123')
+        collection = Collection.objects.get(user=self.user)
+        CollectionCard.objects.create(collection=collection, card=self.base_cards[0], quantity=1)
+        CollectionCard.objects.create(collection=collection, card=self.other_card, quantity=1)
+        UserCard.objects.create(user=self.user, title='Mine', rarity=self.epic, image='user_cards/mine.png')
+
+    def test_full_reset(self):
+        call_command('clear_cards', batch_size=2, stdout=StringIO())
+        for model in (Card, CardSet, Rarity, CollectionCard, UserCard):
+            self.assertFalse(model.objects.exists(), model.__name__)
+        self.assertTrue(PendingFileDeletion.objects.filter(name='user_cards/mine.png').exists())
+
+    def test_scoped_to_a_set(self):
+        get_ownership(self.user.id)
+        call_command('clear_cards', sets=['Base Set'], batch_size=2, stdout=StringIO())
+        self.assertEqual(list(Card.objects.all()), [self.other_card])
+        self.assertEqual(list(CardSet.objects.all()), [self.other])
+        self.assertEqual(Rarity.objects.count(), 2)
+        self.assertEqual(list(CollectionCard.objects.values_list('card_id', flat=True)), [self.other_card.id])
+        self.assertNotIn(self.base_cards[0].id, get_ownership(self.user.id))
+
+    def test_keep_collections_and_user_cards(self):
+        call_command('clear_cards', keep_collections=True, keep_user_cards=True, stdout=StringIO())
+        self.assertEqual(set(Card.objects.all()), {self.base_cards[0], self.other_card})
+        self.assertEqual(CollectionCard.objects.count(), 2)
+        self.assertEqual(CardSet.objects.count(), 2)
+        self.assertEqual(set(Rarity.objects.all()), {self.common, self.epic})
+        self.assertTrue(UserCard.objects.exists())
+
+    def test_unknown_set(self):
+        with self.assertRaises(CommandError):
+            call_command('clear_cards', sets=['Nope'], stdout=StringIO())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class BenchmarkCommandTest(TestCase):
+    """Smoke test for the benchmark command"""
+
+    def setUp(self):
+        cache.clear()
+
+    def run_benchmark(self):
+        out = StringIO()
+        # The test runner already provides a throwaway database and test environment
+        with mock.patch.object(connection.creation, 'create_test_db', return_value=connection.settings_dict['NAME']), \
+                mock.patch.object(connection.creation, 'destroy_test_db'), \
+                mock.patch('WebProjecte.management.commands.benchmark.setup_test_environment'), \
+                mock.patch('WebProjecte.management.commands.benchmark.teardown_test_environment'):
+            call_command('benchmark', users=2, sets=1, cards_per_rarity=2, iterations=3, warmup=1, stdout=out)
+        return json.loads(out.getvalue())
+
+    def test_shared_cache_is_untouched(self):
+        cache.set('sentinel', 1)
+        self.run_benchmark()
+        # No catalog, fragment, ownership or friend entry of the synthetic data leaks out
+        self.assertEqual([key.split(':', 2)[-1] for key in cache._cache], ['sentinel'])
+
+    def test_report_shape(self):
+        report = self.run_benchmark()
+        self.assertEqual(report['config']['users'], 2)
+        self.assertEqual(report['environment']['database'], connection.vendor)
+        self.assertEqual(set(report['results']), {'open_pack', 'collection_view', 'api_cards', 'user_cards_api'})
+        for result in report['results'].values():
+            self.assertEqual(result['iterations'], 3)
+            self.assertEqual(result['errors'], 0)
+            self.assertEqual(set(result['latency_ms']), {'p50', 'p99', 'mean', 'max'})
+            self.assertGreaterEqual(result['queries_per_request']['max'], 0)
+
+    def test_rejects_empty_sizes(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark', users=0, stdout=StringIO())
+
+
+class DatabaseProfileTest(TestCase):
+    """Backend tests for the database profile and its index check"""
+
+    def test_required_indexes_exist_after_migrate(self):
+        self.assertEqual(check_required_indexes(None, databases=['default']), [])
+
+    def test_missing_index_is_reported(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX avatarjob_status_run_idx')
+        warnings = check_required_indexes(None, databases=['default'])
+        self.assertEqual([warning.id for warning in warnings], ['WebProjecte.W001'])
+        self.assertIn('status', warnings[0].msg)
+
+    def test_pending_migrations_skip_the_check(self):
+        # migrate runs the checks before applying the migrations that add the indexes
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX avatarjob_status_run_idx')
+        with mock.patch('WebProjecte.checks.MigrationExecutor.migration_plan', return_value=[mock.Mock()]):
+            self.assertEqual(check_required_indexes(None, databases=['default']), [])
+
+    def test_sqlite_pragmas(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite profile only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        # WAL is persistent and set by a migration; setting it per connection rewrote db.sqlite3
+        self.assertNotIn('journal_mode', connection.settings_dict['OPTIONS']['init_command'])
+
+
+# Routing only: TestCase's wrapping transaction would send every read to the primary
+class ReplicaRouterTest(SimpleTestCase):
+    """Backend tests for read-replica routing and primary pinning"""
+
+    def setUp(self):
+        patcher = mock.patch.dict(settings.DATABASES, {'replica': settings.DATABASES['default']})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+
+    def run_request(self, view, cookies=None):
+        request = self.factory.get('/')
+        request.COOKIES.update(cookies or {})
+        return PrimaryPinMiddleware(view)(request)
+
+    def test_catalog_reads_go_to_the_replica(self):
+        def view(request):
+            self.assertEqual(router.db_for_read(Card), 'replica')
+            self.assertEqual(router.db_for_read(Profile), 'default')
+            self.assertEqual(router.db_for_write(Card), 'default')
+            # Read your own writes for the rest of the request
+            self.assertEqual(router.db_for_read(Card), 'default')
+            return HttpResponse()
+
+        response = self.run_request(view)
+        self.assertEqual(response.cookies['primary_pin']['max-age'], settings.REPLICA_PIN_SECONDS)
+
+    def test_browse_views_read_everything_from_the_replica(self):
+        @read_from_replica
+        def view(request):
+            self.assertEqual(router.db_for_read(Profile), 'replica')
+            with on_primary():
+                self.assertEqual(router.db_for_read(Card), 'default')
+            return HttpResponse()
+
+        response = self.run_request(view)
+        self.assertNotIn('primary_pin', response.cookies)
+
+    def test_pinned_client_reads_the_primary(self):
+        def view(request):
+            self.assertEqual(router.db_for_read(Card), 'default')
+            router.db_for_write(Session)
+            return HttpResponse()
+
+        response = self.run_request(view, cookies={'primary_pin': '1'})
+        # Session saves alone do not pin
+        self.assertNotIn('primary_pin', response.cookies)
+
+    async def test_async_views_keep_routing(self):
+        @read_from_replica
+        async def view(request):
+            self.assertEqual(router.db_for_read(Profile), 'replica')
+            # Writes made in a worker thread still pin the client
+            await sync_to_async(router.db_for_write)(Card)
+            return HttpResponse()
+
+        middleware = PrimaryPinMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(self.factory.get('/'))
+        self.assertIn('primary_pin', response.cookies)
+
+    def test_transactions_read_the_primary(self):
+        def view(request):
+            with mock.patch.object(connections['default'], 'in_atomic_block', True):
+                self.assertEqual(router.db_for_read(Card), 'default')
+            self.assertEqual(router.db_for_read(Card), 'replica')
+            return HttpResponse()
+
+        self.run_request(view)
+
+    def test_commands_read_the_primary(self):
+        # No request scope, as in management commands
+        self.assertEqual(router.db_for_read(Card), 'default')
+
+    def test_streamed_rows_keep_the_replica(self):
+        @read_from_replica
+        def view(request):
+            return stream_queryset(request, Profile.objects.all(), str)
+
+        with mock.patch.object(QuerySet, 'iterator', autospec=True, return_value=iter([])) as iterator:
+            response = self.run_request(view)
+        # Rows are read after the view and the middleware have returned
+        self.assertEqual(b''.join(response.streaming_content), b'[]')
+        self.assertEqual(iterator.call_args.args[0].db, 'replica')
+
+    def test_no_replica_configured(self):
+        del settings.DATABASES['replica']
+        self.assertEqual(router.db_for_read(Card), 'default')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class CatalogCacheTest(TestCase):
+    """Backend tests for the two-level catalog cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.rarity = Rarity.objects.create(title='Common', description='Common', probability=1)
+        self.card_set = CardSet.objects.create(title='Base Set', description='Base set', image='card_sets/base.png')
+        self.card = Card.objects.create(title='Cached', description='Card', rarity=self.rarity, card_set=self.card_set)
+        self.user = User.objects.create_user(username='cacheuser', password='securepassword123')
+        self.client.login(username='cacheuser', password='securepassword123')
+
+    def catalog_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        tables = ('webprojecte_card"', 'webprojecte_cardset"', 'webprojecte_rarity"')
+        return [q['sql'] for q in ctx.captured_queries if any(table in q['sql'].lower() for table in tables)]
+
+    def test_pack_selector_is_served_from_cache(self):
+        self.assertTrue(self.catalog_queries(reverse('select_pack')))
+        self.assertEqual(self.catalog_queries(reverse('select_pack')), [])
+        CardSet.objects.create(title='Second Set', description='New')
+        self.assertTrue(self.catalog_queries(reverse('select_pack')))
+
+    def test_invalidation_is_per_model(self):
+        get_card_sets(), get_rarities(), get_cards()
+        self.rarity.description = 'Changed'
+        self.rarity.save()
+        # Only the rarities are rebuilt
+        with self.assertNumQueries(1):
+            get_card_sets(), get_cards()
+            self.assertEqual(get_rarities()[0]['description'], 'Changed')
+            self.assertEqual(get_cards()[self.card.id]['title'], 'Cached')
+
+    def test_l1_is_used_before_the_shared_cache(self):
+        get_card_sets()
+        with mock.patch.object(cache, 'get', wraps=cache.get) as shared_get:
+            self.assertEqual(get_card_sets()[0]['title'], 'Base Set')
+        fetched = [call.args[0] for call in shared_get.call_args_list]
+        self.assertFalse([key for key in fetched if key.startswith('catalog:card_sets')])
+
+    def test_local_cache_ttl_and_lru(self):
+        local = LocalCache(max_entries=2, ttl=60)
+        local.set('a', 1)
+        local.set('b', 2)
+        local.get('a')
+        local.set('c', 3)
+        self.assertIs(local.get('b'), MISSING)
+        self.assertEqual((local.get('a'), local.get('c')), (1, 3))
+        with mock.patch('WebProjecte.services.local_cache.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIs(local.get('a'), MISSING)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class CardFragmentTest(TestCase):
+    """Backend tests for cached per-card HTML fragments"""
+
+    def setUp(self):
+        cache.clear()
+        rarity = Rarity.objects.create(title='Common', description='Common', probability=1)
+        self.card_set = CardSet.objects.create(title='Base Set', description='Base set')
+        self.owned = Card.objects.create(title='Owned Card', description='Card', image='card_images/owned.png',
+                                         rarity=rarity, card_set=self.card_set)
+        self.missing = Card.objects.create(title='Missing Card', description='Card', image='card_images/missing.png',
+                                           rarity=rarity, card_set=self.card_set)
+        self.user = User.objects.create_user(username='fragmentuser', password='securepassword123')
+        CollectionCard.objects.create(collection=Collection.objects.get(user=self.user), card=self.owned, quantity=1)
+        self.client.login(username='fragmentuser', password='securepassword123')
+
+    def test_ownership_picks_the_fragment(self):
+        response = self.client.get(reverse('collection'))
+        content = response.content.decode()
+        self.assertIn('src="/media/card_images/owned.png"', content)
+        self.assertNotIn('card_images/missing.png', content)
+        self.assertIn('<span class="card-name">Missing Card</span>', content)
+
+    def test_fragments_are_rendered_once(self):
+        self.client.get(reverse('collection'))
+        with mock.patch('WebProjecte.services.card_fragments.get_template', wraps=get_template) as loader:
+            self.client.get(reverse('collection'))
+            self.client.logout()
+            anonymous = self.client.get(reverse('collection')).content.decode()
+        # The anonymous page needs the revealed fragment of the missing card only
+        self.assertEqual(loader.call_count, 1)
+        self.assertIn('card_images/missing.png', anonymous)
+
+    def test_card_change_renders_again(self):
+        self.client.get(reverse('collection'))
+        self.owned.title = 'Renamed Card'
+        self.owned.save()
+        self.assertContains(self.client.get(reverse('collection')), 'alt="Renamed Card"')
+
+    def test_pack_page_uses_fragments(self):
+        response = self.client.post(reverse('open_pack', args=[self.card_set.id]))
+        self.assertEqual(len(response.context['cards_with_status']), 5)
+        self.assertContains(response, 'class="card-img-top"', count=5)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class AsyncViewsTest(TestCase):
+    """Backend tests for the async views served under ASGI"""
+
+    def setUp(self):
+        cache.clear()
+        rarity = Rarity.objects.create(title='Common', description='Common', probability=1)
+        card_set = CardSet.objects.create(title='Base Set', description='Base set')
+        self.cards = [
+            Card.objects.create(title=f'Card {i}', description='Card', image=f'card_images/{i}.png',
+                                rarity=rarity, card_set=card_set)
+            for i in range(3)
+        ]
+        self.user = User.objects.create_user(username='asyncuser', password='securepassword123')
+        collection = Collection.objects.get(user=self.user)
+        for card in self.cards[:2]:
+            CollectionCard.objects.create(collection=collection, card=card, quantity=1)
+
+    async def test_collection_page(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('collection'), {'show': 'owned', 'limit': 1})
+        self.assertEqual([card['name'] for card in response.context['cards']], ['Card 0'])
+        self.assertIn(f'after={self.cards[0].id}', response.context['next_url'])
+        self.assertContains(response, 'Base Set')
+
+    async def test_user_cards_page(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('user_cards_api'), {'limit': 1})
+        self.assertEqual([card['name'] for card in response.json()], ['Card 0'])
+        self.assertIn(f'after={self.cards[0].id}', response['Link'])
+
+        await self.async_client.alogout()
+        response = await self.async_client.get(reverse('user_cards_api'))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_catalog_etag(self):
+        response = await self.async_client.get(reverse('api_cards'))
+        self.assertEqual(len(response.json()), 3)
+        response = await self.async_client.get(reverse('api_cards'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_avatar_preview(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('avatar_preview'), {'seed': 'abc', 'style': 'robot'})
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(Image.open(BytesIO(response.content)).format, 'PNG')
+        response = await self.async_client.get(reverse('avatar_preview'), {'seed': 'abc', 'style': 'nope'})
+        self.assertEqual(response.status_code, 400)
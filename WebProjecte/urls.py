@@ -1,7 +1,7 @@
-from django.urls import path
+from django.urls import path, re_path
 from django.contrib.auth import views as auth_views
-from django.conf.urls.static import static
-from DjangoProjectWeb import settings
+from django.conf import settings
+from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from . import views
 from .views import profile_view
 
@@ -15,6 +15,8 @@ urlpatterns = [
     path('collection/', views.collection_view, name='collection'),
     path('api/cards/', views.api_cards, name='api_cards'),  
     path('api/my-cards/', views.user_cards_api, name='user_cards_api'),
+    path('api/my-cards/export/', views.user_cards_export, name='user_cards_export'),
+    path('avatar/', views.avatar_preview, name='avatar_preview'),
     path('add-card/', views.add_card, name='add_card'),
     path('friends/', views.friends_list, name='friends_list'),
     path('friends/remove/<int:user_id>/', views.remove_friend, name='remove_friend'),
@@ -23,4 +25,13 @@ urlpatterns = [
     path('friends/reject/<int:request_id>/', views.reject_friend_request, name='reject_friend_request'),
     path('select-pack/', views.pack_selector_view, name='select_pack'),
     path('open-pack/<int:set_id>/', views.open_pack_view, name='open_pack'),
-]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), views.media_file, name='media'),
+]
+
+if settings.SERVE_STATIC:
+    urlpatterns.append(
+        re_path(r'^%s(?P<path>.+)$' % settings.STATIC_URL.lstrip('/'), views.static_file, name='static_file')
+    )
+else:
+    # App static files in DEBUG, which only runserver would serve on its own
+    urlpatterns += staticfiles_urlpatterns()
@@ -1,36 +1,42 @@
-import random
-from .models import Card, CollectionCard, Rarity , Collection
+from collections import Counter
+from django.db import transaction
+from django.db.models import Case, F, When
+from .models import CollectionCard, Collection
+from .services.card_sampler import draw_cards
+from .services.ownership import invalidate_ownership
 
-def get_random_card():
-    rarities = Rarity.objects.all()
-    weighted_choices = []
+PACK_SIZE = 5
 
-    for rarity in rarities:
-        cards = Card.objects.filter(rarity=rarity)
-        for card in cards:
-            weighted_choices.append((card, rarity.probability))
+def open_pack(user, card_set, num_cards=PACK_SIZE):
+    """Draw ``num_cards`` cards from ``card_set`` into the user's collection.
 
-    selected = random.choices(
-        [card for card, prob in weighted_choices],
-        weights=[prob for card, prob in weighted_choices],
-        k=1
-    )[0]
-    return selected
+    Returns a list of ``(card, is_new)`` pairs in draw order, where ``is_new``
+    tells whether the user did not own the card before this pack.
+    """
+    obtained_cards = draw_cards(card_set.id, k=num_cards)
+    counts = Counter(card.id for card in obtained_cards)
 
-def open_pack(user, num_cards=5):
-    collection, _ = Collection.objects.get_or_create(user=user)
-    obtained_cards = []
+    with transaction.atomic():
+        collection, _ = Collection.objects.get_or_create(user=user)
+        owned_card_ids = set(
+            CollectionCard.objects.filter(collection=collection, card_id__in=counts)
+            .values_list('card_id', flat=True)
+        )
 
-    for _ in range(num_cards):
-        card = get_random_card()
-        cc, created = CollectionCard.objects.get_or_create(
-            collection=collection,
-            card=card,
-            defaults={'quantity': 1}
+        # Rows for new cards start at zero and get the same increment as the rest
+        CollectionCard.objects.bulk_create(
+            [CollectionCard(collection=collection, card_id=card_id, quantity=0)
+             for card_id in counts if card_id not in owned_card_ids],
+            ignore_conflicts=True,
+        )
+        CollectionCard.objects.filter(collection=collection, card_id__in=counts).update(
+            quantity=F('quantity') + Case(
+                *[When(card_id=card_id, then=n) for card_id, n in counts.items()]
+            )
         )
-        if not created:
-            cc.quantity += 1
-            cc.save()
-        obtained_cards.append(card)
 
-    return obtained_cards
+    if owned_card_ids != counts.keys():
+        invalidate_ownership(user.id)
+        transaction.on_commit(lambda: invalidate_ownership(user.id))
+
+    return [(card, card.id not in owned_card_ids) for card in obtained_cards]
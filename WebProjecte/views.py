@@ -3,23 +3,48 @@ from django.contrib.auth import logout as auth_logout, login
 from django.shortcuts import redirect
 
 from WebProjecte.services.profile_image import generate_avatar
+from WebProjecte.services.avatar_renderer import AVATAR_STYLES, avatar_png
 from .forms import CustomUserCreationForm
-from django.db.models import Q
 from .models import Profile, FriendRequest
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django import forms
-from .utils import open_pack
+from .utils import open_pack, PACK_SIZE
+from .services.catalog import (
+    api_card_entry, api_card_rows, get_api_cards_json, get_catalog_version, get_model_versions, image_url,
+)
+from .services.ownership import get_ownership
+from .services.catalog_cache import get_card_ids, get_card_ids_by_title, get_card_sets, get_cards, get_rarities
+from .services.card_fragments import COLLECTION_CARD, COLLECTION_CARD_HIDDEN, PACK_CARD, card_fragments
+from .services.thumbnails import delete_thumbnails, generate_thumbnails, srcset
+from .services.file_cleanup import queue_file_deletion
+from .services.account_deletion import delete_user_batch
+from .services.file_serving import serve_file
+from .services.rate_limit import rate_limited
+from django.conf import settings
+from .services.user_search import search_users
+from .services.friend_graph import are_friends, friend_count, get_friend_ids, suggest_friends
+from .db_router import read_from_replica
+from .services.json_stream import stream_queryset
 from django.contrib.auth.decorators import user_passes_test
 from .forms import UserCardForm
-from .models import Card, CollectionCard, Collection ,CardSet , UserCard
+from .models import Card, CollectionCard, CardSet , UserCard
 import os
-import requests
+from bisect import bisect_right
+from itertools import islice
 from django.core.files.base import ContentFile
 from .models import PackStatus
-from django.utils import timezone
+from django.db import transaction
+from asgiref.sync import sync_to_async
+
+USER_CARDS_PAGE_SIZE = 100
+USER_CARDS_MAX_PAGE_SIZE = 500
+CATALOG_MAX_AGE = 60
+COLLECTION_PAGE_SIZE = 60
+COLLECTION_MAX_PAGE_SIZE = 200
 
 # Create your views here.
 
@@ -30,7 +55,9 @@ def home(request):
 class ProfileUpdateForm(forms.ModelForm):
     username = forms.CharField(max_length=150, required=False)
     password = forms.CharField(widget=forms.PasswordInput(), required=False)
-    dicebear_url = forms.CharField(widget=forms.HiddenInput(), required=False)
+    avatar_seed = forms.CharField(widget=forms.HiddenInput(), required=False, max_length=64)
+    avatar_style = forms.ChoiceField(widget=forms.HiddenInput(), required=False,
+                                     choices=[(style, style) for style in AVATAR_STYLES])
 
     class Meta:
         model = Profile
@@ -63,31 +90,11 @@ def profile_view(request):
             user = request.user
 
             try:
-                # Delete the profile image if it exists and is not the default one
-                if hasattr(user, 'profile') and user.profile.profile_image:
-                    try:
-                        image_path = user.profile.profile_image.path
-                        if os.path.exists(image_path) and 'default.jpg' not in image_path:
-                            os.remove(image_path)
-                    except Exception as e:
-                        print(f"Error when deleting profile image: {e}")
-
-                # Delete friend requests related to the user
-                FriendRequest.objects.filter(Q(from_user=user) | Q(to_user=user)).delete()
-
-                # Delete collection and its cards if they exist
-                try:
-                    collection = Collection.objects.get(user=user)
-                    CollectionCard.objects.filter(collection=collection).delete()
-                    collection.delete()
-                except Collection.DoesNotExist:
-                    pass
-
                 # Close session and log out the user
                 auth_logout(request)
 
-                # Delete the user account and profile
-                user.delete()
+                # Delete the account and every row referencing it; the images go to the sweeper queue
+                delete_user_batch([user.pk])
 
                 messages.success(request, 'Your account has been successfully deleted.')
                 return redirect('home')
@@ -111,18 +118,19 @@ def profile_view(request):
             if password:
                 user.set_password(password)
             
-            # Check if a new profile image was uploaded or DiceBear was used
+            # Check if a new profile image was uploaded or a random avatar was picked
             has_new_upload = request.FILES.get('profile_image') is not None
-            dicebear_url = form.cleaned_data.get('dicebear_url')
+            avatar_seed = form.cleaned_data.get('avatar_seed')
             
             # Handle profile image update
-            if has_new_upload or dicebear_url:
+            if has_new_upload or avatar_seed:
                 # Delete previous image if it exists and is not the default one
                 if profile.profile_image:
                     try:
                         image_path = profile.profile_image.path
                         if os.path.exists(image_path) and 'default.jpg' not in image_path:
                             os.remove(image_path)
+                        delete_thumbnails(profile.profile_image.name, profile.profile_image.storage)
                     except Exception as e:
                         messages.error(request, f"Error deleting previous image: {e}")
                 
@@ -130,20 +138,17 @@ def profile_view(request):
                 profile_filename = f"profilepic_{user.username}.png"
                 
                 # Save new image based on source
-                if dicebear_url:
-                    # Using DiceBear takes priority over manual upload
+                if avatar_seed:
+                    # A random avatar takes priority over manual upload
                     try:
-                        response = requests.get(dicebear_url)
-                        if response.status_code == 200:
-                            # Always use the same name format for all images
-                            profile_filename = f"profilepic_{user.username}.png"
-                            profile.profile_image.save(
-                                profile_filename,
-                                ContentFile(response.content),
-                                save=False
-                            )
-                    except Exception as e:
-                        messages.error(request, f"Error downloading profile image: {e}")
+                        avatar_style = form.cleaned_data.get('avatar_style') or 'robot'
+                        profile.profile_image.save(
+                            profile_filename,
+                            ContentFile(avatar_png(avatar_seed, avatar_style)),
+                            save=False
+                        )
+                    except OSError as e:
+                        messages.error(request, f"Error generating profile image: {e}")
                 elif has_new_upload:
                     # Process manually uploaded image - use exactly the same name
                     # for consistency and to avoid having multiple files
@@ -174,6 +179,7 @@ def profile_view(request):
     context = {
         'profile': profile,
         'form': form,
+        'friend_count': friend_count(request.user.id),
     }
     return render(request, 'profile.html', context)
 
@@ -203,49 +209,116 @@ def register(request):
 def how_to_play(request):
     return render(request, 'how_to_play.html')
 
-def api_cards(request):
-    cards = Card.objects.select_related('rarity')
-    data = [{
-        'name': card.title,
-        'image': card.image.url,
-        'text': card.description,
-        'power': getattr(card, 'power', '?'),
-        'cost': getattr(card, 'cost', 0),
-        'type': card.rarity.title
-    } for card in cards]
-    return JsonResponse(data, safe=False)
+@read_from_replica
+async def api_cards(request):
+    if request.GET.get('stream'):
+        # Walks the table in chunks instead of caching one big body
+        return stream_queryset(request, api_card_rows(), api_card_entry)
+
+    # The serialized catalog only changes with the catalog version
+    version = await sync_to_async(get_catalog_version)()
+    etag = f'"catalog-{version}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        body = await sync_to_async(get_api_cards_json)(version)
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=CATALOG_MAX_AGE)
+    return response
+
+
+USER_CARD_FIELDS = (
+    'card_id', 'quantity', 'card__title', 'card__description', 'card__image',
+    'card__card_set__title', 'card__rarity__title',
+)
+
+
+def user_card_entry(row):
+    return {
+        'id': row['card_id'],
+        'name': row['card__title'],
+        'text': row['card__description'],
+        'image': image_url(row['card__image']),
+        'type': row['card__card_set__title'],
+        'rarity': row['card__rarity__title'] or '',
+        'quantity': row['quantity'],
+    }
+
+
+def user_cards_queryset(user, after=0, card_set_id=None, rarity_id=None):
+    user_cards = CollectionCard.objects.filter(collection__user=user, card_id__gt=after)
+    if card_set_id is not None:
+        user_cards = user_cards.filter(card__card_set_id=card_set_id)
+    if rarity_id is not None:
+        user_cards = user_cards.filter(card__rarity_id=rarity_id)
+    # One joined query, no model instances
+    return user_cards.order_by('card_id').values(*USER_CARD_FIELDS)
+
+
 @login_required
-def user_cards_api(request):
-    user = request.user
-    user_cards = CollectionCard.objects.filter(collection__user=user)
+async def user_cards_api(request):
+    """Cards owned by the current user, ordered by card id.
+
+    Optional filters: ``set`` (card set id) and ``rarity`` (rarity id).
+    Results are keyset paginated with ``after`` (last card id seen) and
+    ``limit``; the next page URL is sent in the ``Link`` header. With
+    ``stream=1`` every matching card is streamed instead of one page.
+    """
+    try:
+        after = int(request.GET.get('after', 0))
+        limit = min(int(request.GET.get('limit', USER_CARDS_PAGE_SIZE)), USER_CARDS_MAX_PAGE_SIZE)
+        card_set_id = int(request.GET['set']) if request.GET.get('set') else None
+        rarity_id = int(request.GET['rarity']) if request.GET.get('rarity') else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid query parameters.'}, status=400)
+    if limit < 1:
+        return JsonResponse({'error': 'limit must be positive.'}, status=400)
+
+    user_cards = user_cards_queryset(await request.auser(), after, card_set_id, rarity_id)
+    if request.GET.get('stream'):
+        return stream_queryset(request, user_cards, user_card_entry)
+
+    rows = [row async for row in user_cards[:limit + 1]]
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+
+    response = JsonResponse([user_card_entry(row) for row in rows], safe=False)
+    if has_next:
+        query = request.GET.copy()
+        query['after'] = rows[-1]['card_id']
+        response['Link'] = f'<{request.path}?{query.urlencode()}>; rel="next"'
+    return response
 
-    data = [
-        {
-            'name': cc.card.title,
-            'text': cc.card.description,
-            'image': cc.card.image.url,
-            'type': cc.card.card_set.title,
-            'rarity': cc.card.rarity.title if hasattr(cc.card, 'rarity') else '',
-        }
-        for cc in user_cards
-    ]
 
-    return JsonResponse(data, safe=False)
+@login_required
+def user_cards_export(request):
+    # Whole collection as a download, streamed so memory stays flat
+    return stream_queryset(
+        request, user_cards_queryset(request.user), user_card_entry,
+        filename=f'{request.user.username}-cards.json',
+    )
 
 @login_required
 def add_card(request):
     if request.method == 'POST':
         form = UserCardForm(request.POST, request.FILES)
         if form.is_valid():
-            previous_cards = UserCard.objects.filter(user=request.user)
-            for card in previous_cards:
-                if card.image:
-                    card.image.delete(save=False)
-            previous_cards.delete()
-
             card = form.save(commit=False)
             card.user = request.user
-            card.save()
+            previous_image = UserCard.objects.filter(user=request.user).values_list('image', flat=True).first()
+
+            # One card per user: insert or replace it in a single statement
+            with transaction.atomic():
+                UserCard.objects.bulk_create(
+                    [card],
+                    update_conflicts=True,
+                    unique_fields=['user'],
+                    update_fields=['title', 'description', 'image', 'rarity', 'created_at'],
+                )
+                if previous_image and previous_image != card.image.name:
+                    queue_file_deletion([previous_image])
+                # bulk_create sends no post_save, so derivatives are queued here
+                transaction.on_commit(lambda: generate_thumbnails(card.image.name, card.image.storage))
             return redirect('home')
     else:
         form = UserCardForm()
@@ -253,20 +326,42 @@ def add_card(request):
     return render(request, 'add_card.html', {'form': form})
 
 @login_required
+@read_from_replica
 def friends_list(request):
-    profile = request.user.profile
-    query = request.GET.get('q')
-    search_results = []
+    query = request.GET.get('q', '').strip()
+    after = None
+    if request.GET.get('after_id'):
+        try:
+            after = (request.GET.get('after', ''), int(request.GET['after_id']))
+        except ValueError:
+            return redirect('friends_list')
+
+    search_results, next_after = search_users(request.user, query, after) if query else ([], None)
+    next_url = None
+    if next_after is not None:
+        params = request.GET.copy()
+        params['after'], params['after_id'] = next_after
+        next_url = f'?{params.urlencode()}'
 
-    if query:
-        search_results = User.objects.filter(
-            Q(username__icontains=query)
-        ).exclude(id=request.user.id)
+    friend_ids = get_friend_ids(request.user.id)
+    suggestions = suggest_friends(request.user.id)
+    # One query resolves the names for every id the page shows
+    usernames = dict(User.objects.filter(id__in=friend_ids | {user_id for user_id, _ in suggestions})
+                     .values_list('id', 'username'))
+
+    friends = [{'id': user_id, 'username': usernames[user_id]} for user_id in friend_ids if user_id in usernames]
 
     context = {
-        'friends': profile.friends.all(),
+        'friends': sorted(friends, key=lambda friend: friend['username'].casefold()),
+        'received_requests': request.user.received_requests.values('id', 'from_user__username'),
+        'suggestions': [
+            {'id': user_id, 'username': usernames[user_id], 'mutual': mutual}
+            for user_id, mutual in suggestions if user_id in usernames
+        ],
         'search_results': search_results,
         'query': query,
+        'is_first_page': after is None,
+        'next_url': next_url,
     }
     return render(request, 'friends/friends_list.html', context)
 
@@ -279,7 +374,9 @@ def remove_friend(request, user_id):
 @login_required
 def send_friend_request(request, user_id):
     to_user = get_object_or_404(User, id=user_id)
-    FriendRequest.objects.get_or_create(from_user=request.user, to_user=to_user)
+    # Friends already are, the cached graph answers without a query
+    if not are_friends(request.user.id, to_user.id):
+        FriendRequest.objects.get_or_create(from_user=request.user, to_user=to_user)
     return redirect('friends_list')
 
 @login_required
@@ -301,41 +398,56 @@ def reject_friend_request(request, request_id):
 @login_required
 def open_pack_view(request, set_id):
     card_set = get_object_or_404(CardSet, pk=set_id)
-    status, _ = PackStatus.objects.get_or_create(user=request.user)
-    status.update_packs()
 
     if request.method == 'POST':
-        if status.packs_available > 0:
-            status.packs_available -= 1
-            status.last_opened = timezone.now()
-            status.save()
-
-            collection = Collection.objects.get(user=request.user)
-            owned_card_ids = set(CollectionCard.objects.filter(collection=collection).values_list('card_id', flat=True))
-
-            cards = open_pack(request.user, card_set.id)
+        status, _ = PackStatus.objects.get_or_create(user=request.user)
+        try:
+            # Spending the pack and storing its cards succeed or fail together
+            with transaction.atomic():
+                if status.consume_pack() is None:
+                    messages.error(request, 'You have no packs available. Please wait for regeneration.')
+                    return redirect('open_pack', set_id=set_id)
+                opened = open_pack(request.user, card_set, PACK_SIZE)
+        except ValueError:
+            messages.error(request, 'This pack has no cards yet.')
+            return redirect('open_pack', set_id=set_id)
 
-            cards_with_status = []
-            for card in cards:
-                is_new = card.id not in owned_card_ids
-                cards_with_status.append({'card': card, 'is_new': is_new})
+        fragments = card_fragments([card.id for card, _ in opened], PACK_CARD)
+        cards_with_status = [
+            {'card': card, 'is_new': is_new, 'html': fragments.get(card.id, '')}
+            for card, is_new in opened
+        ]
 
-            return render(request, 'pack_opened.html', {
-                'cards_with_status': cards_with_status
-            })
-        else:
-            messages.error(request, 'You have no packs available. Please wait for regeneration.')
-            return redirect('open_pack', set_id=set_id)
+        return render(request, 'pack_opened.html', {
+            'cards_with_status': cards_with_status
+        })
 
+    # A plain read: get_or_create asks the router for the write database,
+    # which would pin the client to the primary for merely viewing the page
+    status = PackStatus.objects.filter(user=request.user).first() or PackStatus(user=request.user)
     return render(request, 'open_pack.html', {
         'card_set': card_set,
-        'packs_available': status.packs_available
+        'packs_available': status.current_packs
     })
 
 @login_required
+@read_from_replica
 def pack_selector_view(request):
-    card_sets = CardSet.objects.all()
-    return render(request, 'select_pack.html', {'card_sets': card_sets})
+    storage = CardSet._meta.get_field('image').storage
+
+    # Called by the template only when the cached grid has to be rendered
+    def card_sets():
+        return [
+            {**card_set, 'image_url': storage.url(card_set['image']) if card_set['image'] else '',
+             'srcset': srcset(card_set['image'], storage)}
+            for card_set in get_card_sets()
+        ]
+
+    return render(request, 'select_pack.html', {
+        'card_sets': card_sets,
+        # The rendered grid is cached until a card set changes
+        'card_sets_version': get_model_versions(['CardSet'])[0],
+    })
 
 
 @login_required
@@ -349,26 +461,127 @@ def refresh_avatar(request):
         return redirect('profile')
     return render(request, 'profile.html')
 
-def collection_view(request):
-    user_cards_ids = set()
+def media_file(request, path):
+    # Uploaded images keep their name when replaced, so caches must revalidate them
+    return serve_file(request, path, settings.MEDIA_ROOT, settings.MEDIA_MAX_AGE,
+                      sendfile_header=settings.MEDIA_SENDFILE_HEADER,
+                      sendfile_prefix=settings.MEDIA_ACCEL_PREFIX)
 
-    if request.user.is_authenticated:
-        try:
-            collection = Collection.objects.get(user=request.user)
-            user_cards_ids = set(
-                CollectionCard.objects.filter(collection=collection).values_list('card_id', flat=True)
-            )
-        except Collection.DoesNotExist:
-            # If the user does not have a collection, we can skip this part
-            pass
-
-    cards = []
-    for card in Card.objects.all().order_by('id'):
-        cards.append({
-            'id': card.id,
-            'name': card.title,
-            'image': card.image,
-            'has': card.id in user_cards_ids
-        })
 
-    return render(request, 'collection.html', {'cards': cards})
\ No newline at end of file
+def static_file(request, path):
+    # Collected names carry a content hash, so they never change
+    return serve_file(request, path, settings.STATIC_ROOT, 365 * 24 * 3600, immutable=True)
+
+
+@login_required
+async def avatar_preview(request):
+    # Deterministic for a given seed and style, so browsers may keep it forever
+    seed = request.GET.get('seed', '')[:64]
+    style = request.GET.get('style', 'robot')
+    if not seed or style not in AVATAR_STYLES:
+        return HttpResponse(status=400)
+    user = await request.auser()
+    if await sync_to_async(rate_limited)(f'avatar_preview:{user.pk}', settings.AVATAR_PREVIEW_RATE_LIMIT, 60):
+        response = HttpResponse(status=429)
+        response['Retry-After'] = '60'
+        return response
+    # Rendering is CPU work, a worker thread keeps the event loop serving other requests
+    content = await sync_to_async(avatar_png, thread_sensitive=False)(seed, style)
+    response = HttpResponse(content, content_type='image/png')
+    patch_cache_control(response, private=True, max_age=365 * 24 * 3600, immutable=True)
+    return response
+
+def collection_page(user_id, after, limit, card_set_id=None, rarity_id=None, show='', query=''):
+    """One collection page as ``(entries, next_after)``, filtered and paged in memory.
+
+    Reads only the cached catalog projections, the ownership bitmap and the
+    card fragments, so a warm page runs no catalog query at all. Pages walk
+    the id list of their set and rarity, or the cards matching the title
+    prefix when there are fewer of those, so only the owned/missing filter
+    skips cards one by one.
+    """
+    catalog = get_cards()
+    card_ids = get_card_ids(card_set_id, rarity_id)
+    owned = get_ownership(user_id) if user_id is not None else None
+    prefix = query.casefold()
+    if prefix:
+        titled = get_card_ids_by_title(prefix)
+        if len(titled) < len(card_ids):
+            card_ids = titled
+
+    matches = []
+    for card_id in islice(card_ids, bisect_right(card_ids, after), None):
+        card = catalog.get(card_id)
+        if (card is None
+                or card_set_id is not None and card['card_set_id'] != card_set_id
+                or rarity_id is not None and card['rarity_id'] != rarity_id
+                or prefix and not card['title'].casefold().startswith(prefix)
+                or owned is not None and show == 'owned' and card_id not in owned
+                or owned is not None and show == 'missing' and card_id in owned):
+            continue
+        matches.append(card_id)
+        if len(matches) > limit:
+            break
+    next_after = matches[limit - 1] if len(matches) > limit else None
+    card_ids = matches[:limit]
+
+    # Cached per-card HTML; ownership only picks the revealed or the hidden fragment
+    has = {card_id: owned is None or card_id in owned for card_id in card_ids}
+    revealed = card_fragments([card_id for card_id in card_ids if has[card_id]], COLLECTION_CARD, catalog)
+    hidden = card_fragments([card_id for card_id in card_ids if not has[card_id]], COLLECTION_CARD_HIDDEN, catalog)
+    fragments = {**revealed, **hidden}
+    return [
+        {
+            'id': card_id,
+            'name': catalog[card_id]['title'],
+            'has': owned is not None and has[card_id],
+            'html': fragments[card_id],
+        }
+        for card_id in card_ids
+        if card_id in fragments
+    ], next_after
+
+
+@read_from_replica
+async def collection_view(request):
+    """Catalog browser with the user's owned cards revealed.
+
+    Filters: ``set`` and ``rarity`` ids, ``show`` (``owned`` or ``missing``)
+    and ``q`` (title prefix). Pages are keyset paginated on card id with
+    ``after`` and ``limit`` over the cached catalog projection.
+    """
+    try:
+        after = int(request.GET.get('after') or 0)
+        limit = int(request.GET.get('limit') or COLLECTION_PAGE_SIZE)
+        card_set_id = int(request.GET['set']) if request.GET.get('set') else None
+        rarity_id = int(request.GET['rarity']) if request.GET.get('rarity') else None
+    except ValueError:
+        return redirect('collection')
+    limit = max(1, min(limit, COLLECTION_MAX_PAGE_SIZE))
+    show = request.GET.get('show', '')
+    query = request.GET.get('q', '').strip()
+
+    user = await request.auser()
+    page, next_after = await sync_to_async(collection_page)(
+        user.id, after, limit, card_set_id, rarity_id, show, query,
+    )
+
+    params = request.GET.copy()
+    params.pop('after', None)
+    first_url = f'?{params.urlencode()}'
+    next_url = None
+    if next_after is not None:
+        params['after'] = next_after
+        next_url = f'?{params.urlencode()}'
+
+    # Rendered in a thread: the base template reads request.user, which may still need a query,
+    # and the filter lists are called lazily from there too
+    return await sync_to_async(render)(request, 'collection.html', {
+        'cards': page,
+        'card_sets': lambda: sorted(get_card_sets(), key=lambda card_set: card_set['title']),
+        'rarities': get_rarities,
+        'filters': {'set': card_set_id, 'rarity': rarity_id, 'show': show, 'q': query},
+        'is_first_page': not after,
+        'first_url': first_url,
+        'next_url': next_url,
+    })